@@ -130,6 +130,87 @@ app_license = "mit"
 # 	}
 # }
 
+doc_events = {
+	"Item": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_update": "jawad.jawad.search.index_item",
+		"on_trash": [
+			"jawad.jawad.sync.record_tombstone",
+			"jawad.jawad.search.remove_item",
+		],
+		"after_rename": [
+			"jawad.jawad.sync.record_rename_tombstone",
+			"jawad.jawad.search.rename_item",
+		],
+	},
+	"Customer": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_trash": "jawad.jawad.sync.record_tombstone",
+		"after_rename": "jawad.jawad.sync.record_rename_tombstone",
+	},
+	"Brand": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_update": "jawad.jawad.cache.invalidate",
+		"on_trash": [
+			"jawad.jawad.sync.record_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+		"after_rename": [
+			"jawad.jawad.sync.record_rename_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+	},
+	"Item Group": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_update": "jawad.jawad.cache.invalidate",
+		"on_trash": [
+			"jawad.jawad.sync.record_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+		"after_rename": [
+			"jawad.jawad.sync.record_rename_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+	},
+	"Branch": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_update": "jawad.jawad.cache.invalidate",
+		"on_trash": [
+			"jawad.jawad.sync.record_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+		"after_rename": [
+			"jawad.jawad.sync.record_rename_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+	},
+	"Promotional Scheme": {
+		"after_insert": "jawad.jawad.sync.clear_tombstone",
+		"on_update": "jawad.jawad.cache.invalidate",
+		"on_trash": [
+			"jawad.jawad.sync.record_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+		"after_rename": [
+			"jawad.jawad.sync.record_rename_tombstone",
+			"jawad.jawad.cache.invalidate",
+		],
+	},
+	"OAuth Client": {
+		"on_update": "jawad.jawad.oauth.invalidate_oauth_clients",
+		"on_trash": "jawad.jawad.oauth.invalidate_oauth_clients",
+		"after_rename": "jawad.jawad.oauth.invalidate_oauth_clients",
+	},
+	"OAuth Bearer Token": {
+		"on_update": "jawad.jawad.tokens.revoke_bearer_token",
+		"on_trash": "jawad.jawad.tokens.revoke_bearer_token",
+	},
+	"User": {
+		"on_update": "jawad.jawad.tokens.revoke_user_tokens",
+		"on_trash": "jawad.jawad.tokens.revoke_user_tokens",
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
@@ -151,6 +232,24 @@ app_license = "mit"
 # 	],
 # }
 
+scheduler_events = {
+	"all": [
+		"jawad.jawad.audit.flush_login_audit",
+	],
+	"cron": {
+		"* * * * *": [
+			"jawad.jawad.orders.enqueue_due_retries",
+		],
+	},
+	"hourly_long": [
+		"jawad.jawad.catalog.build_snapshots",
+	],
+	"daily": [
+		"jawad.jawad.sync.purge_tombstones",
+		"jawad.jawad.audit.purge_login_audit",
+	],
+}
+
 # Testing
 # -------
 
@@ -162,6 +261,9 @@ app_license = "mit"
 # override_whitelisted_methods = {
 # 	"frappe.desk.doctype.event.event.get_events": "jawad.event.get_events"
 # }
+override_whitelisted_methods = {
+	"frappe.integrations.oauth2.revoke_token": "jawad.jawad.tokens.revoke_token"
+}
 #
 # each overriding function accepts a `data` argument;
 # generated from the base implementation of the doctype dashboard,
@@ -184,6 +286,11 @@ app_license = "mit"
 # before_request = ["jawad.utils.before_request"]
 # after_request = ["jawad.utils.after_request"]
 
+after_request = [
+	"jawad.jawad.traffic.record_request",
+	"jawad.jawad.response.compress_response",
+]
+
 # Job Events
 # ----------
 # before_job = ["jawad.utils.before_job"]
@@ -219,4 +326,7 @@ app_license = "mit"
 # auth_hooks = [
 # 	"jawad.auth.validate"
 # ]
+
+auth_hooks = ["jawad.jawad.tokens.validate_auth"]
+
 fixtures = [{"dt": "Custom Field", "filters": {"module": "Jawad"}}]
@@ -6,33 +6,53 @@ import json
 from frappe.utils import now_datetime
 
 from frappe.model.mapper import get_mapped_doc
+from frappe.query_builder import Order
 from frappe.utils import now_datetime
 from werkzeug.wrappers import Response
 import frappe
 import json
 
+from frappe.utils import cint
+
+from jawad.jawad.cache import cached
+from jawad.jawad.etag import conditional
+from jawad.jawad.fieldsets import InvalidFieldsRequest, parse_fields, select_fields
+from jawad.jawad.idempotency import idempotent
+from jawad.jawad.metrics import instrument
+from jawad.jawad.orders import (
+    BULK_ORDER_BATCH_SIZE,
+    BULK_ORDER_LIMIT,
+    InvalidOrder,
+    enqueue_order,
+    save_order,
+    save_orders,
+)
+from jawad.jawad.pagination import (
+    InvalidPageRequest,
+    iter_batches,
+    paginate,
+    split_page,
+)
+from jawad.jawad.response import error_response, json_response
+from jawad.jawad.search import InvalidSearchRequest, search_items as search_item_names
+from jawad.jawad.streaming import stream_response
+
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_customer():
 
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     required_fields = ["name", "phone", "email", "country_code"]
     missing_fields = [field for field in required_fields if not data.get(field)]
     if missing_fields:
-        return Response(
-            json.dumps(
-                {"error": f"Missing required fields: {', '.join(missing_fields)}"}
-            ),
-            status=400,
-            mimetype="application/json",
+        return error_response(
+            f"Missing required fields: {', '.join(missing_fields)}", 400
         )
 
     existing_customer = frappe.get_all(
@@ -63,35 +83,20 @@ def create_customer():
         limit=1,
     )
     if exsisting_business_details:
-        return Response(
-            json.dumps(
-                {
-                    "error": f"A business with this name and VAT/CR number already exists: {data.get('name')}"
-                }
-            ),
-            status=400,
-            mimetype="application/json",
+        return error_response(
+            f"A business with this name and VAT/CR number already exists: {data.get('name')}",
+            400,
         )
     if existing_customer:
-        return Response(
-            json.dumps(
-                {
-                    "error": f"A customer with this phone number already exists: {data.get('phone')}"
-                }
-            ),
-            status=400,
-            mimetype="application/json",
+        return error_response(
+            f"A customer with this phone number already exists: {data.get('phone')}",
+            400,
         )
 
     if existing_email_customer:
-        return Response(
-            json.dumps(
-                {
-                    "error": f"A customer with this email address already exists: {data.get('email')}"
-                }
-            ),
-            status=400,
-            mimetype="application/json",
+        return error_response(
+            f"A customer with this email address already exists: {data.get('email')}",
+            400,
         )
     business_details = frappe.get_doc(
         {
@@ -180,38 +185,24 @@ def create_customer():
         },
     }
 
-    return Response(
-        json.dumps({"message": message, "data": response_data}),
-        status=200,
-        mimetype="application/json",
-    )
+    return json_response({"message": message, "data": response_data})
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def delete_customer():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     customer_id = data.get("customer_id")
     if not customer_id:
-        return Response(
-            json.dumps({"error": "customer_id is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("customer_id is required.", 400)
 
     if not frappe.db.exists("Customer", customer_id):
-        return Response(
-            json.dumps({"error": f"Customer '{customer_id}' does not exist."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Customer '{customer_id}' does not exist.", 404)
 
     try:
 
@@ -223,53 +214,35 @@ def delete_customer():
         if user_email and frappe.db.exists("User", user_email):
             frappe.delete_doc("User", user_email, ignore_permissions=True)
 
-        return Response(
-            json.dumps(
-                {
-                    "message": f"Customer '{customer_id}' and linked user deleted successfully."
-                }
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {
+                "message": f"Customer '{customer_id}' and linked user deleted successfully."
+            }
         )
 
     except Exception as e:
         frappe.log_error(str(e), "Delete Customer and User Error")
-        return Response(
-            json.dumps({"error": f"Failed to delete: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Failed to delete: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_item():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     item_code = data.get("item_code")
     if not item_code:
-        return Response(
-            json.dumps({"error": "item_code is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("item_code is required.", 400)
 
     existing_item = frappe.db.exists("Item", {"item_code": item_code})
 
     if existing_item:
         item = frappe.get_doc("Item", existing_item)
-        return Response(
-            json.dumps({"error": f"Item with item_code {item_code} already exists."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Item with item_code {item_code} already exists.", 400)
     else:
         item = frappe.get_doc(
             {
@@ -345,40 +318,26 @@ def create_item():
         "subcatimg": media_urls,
     }
 
-    return Response(
-        json.dumps({"message": message, "data": response_data}),
-        status=200,
-        mimetype="application/json",
-    )
+    return json_response({"message": message, "data": response_data})
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def update_item():
 
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     item_code = data.get("item_code")
     if not item_code:
-        return Response(
-            json.dumps({"error": "item_code is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("item_code is required.", 400)
 
     existing_item = frappe.db.exists("Item", {"item_code": item_code})
     if not existing_item:
-        return Response(
-            json.dumps({"error": f"Item with item_code '{item_code}' does not exist."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Item with item_code '{item_code}' does not exist.", 404)
 
     item = frappe.get_doc("Item", existing_item)
 
@@ -452,38 +411,26 @@ def update_item():
         "subcatimg": media_urls,
     }
 
-    return Response(
-        json.dumps({"message": "Item updated successfully", "data": response_data}),
-        status=200,
-        mimetype="application/json",
+    return json_response(
+        {"message": "Item updated successfully", "data": response_data}
     )
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def delete_item():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     item_code = data.get("item_code")
     if not item_code:
-        return Response(
-            json.dumps({"error": "item_code is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("item_code is required.", 400)
 
     if not frappe.db.exists("Item", {"item_code": item_code}):
-        return Response(
-            json.dumps({"error": f"Item with code '{item_code}' does not exist."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Item with code '{item_code}' does not exist.", 404)
 
     try:
 
@@ -491,39 +438,25 @@ def delete_item():
 
         frappe.delete_doc("Item", item_name, ignore_permissions=True)
 
-        return Response(
-            json.dumps({"message": f"Item '{item_code}' deleted successfully."}),
-            status=200,
-            mimetype="application/json",
-        )
+        return json_response({"message": f"Item '{item_code}' deleted successfully."})
 
     except Exception as e:
         frappe.log_error(str(e), "Delete Item Error")
-        return Response(
-            json.dumps({"error": f"Failed to delete Item: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Failed to delete Item: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_or_update_warehouse():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     warehouse_name = data.get("warehouse_name")
     if not warehouse_name:
-        return Response(
-            json.dumps({"error": "warehouse_name is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("warehouse_name is required.", 400)
 
     existing_warehouse = frappe.db.exists(
         "Warehouse", {"warehouse_name": warehouse_name}
@@ -566,183 +499,79 @@ def create_or_update_warehouse():
         "warehouse_code": warehouse.custom_warehouse_code,
     }
 
-    return Response(
-        json.dumps({"message": message, "data": warehouse_data}),
-        status=200,
-        mimetype="application/json",
-    )
+    return json_response({"message": message, "data": warehouse_data})
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_or_update_order():
-    import json
-    from frappe import _
-
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
-
-    if not data.get("user_id"):
-        return Response(
-            json.dumps({"error": "user_id is required."}),
-            status=400,
-            mimetype="application/json",
-        )
-
-    if not data.get("items"):
-        return Response(
-            json.dumps({"error": "items list is required."}),
-            status=400,
-            mimetype="application/json",
-        )
-
-    invoice_items = []
-    for item in data.get("items", []):
-        if not frappe.db.exists("Item", {"name": item["item_code"]}):
-            continue
-
-        invoice_items.append(
-            {
-                "item_code": item["item_code"],
-                "qty": item.get("quantity", 0),
-                "rate": item.get("price", 0),
-                "delivery_date": item.get("delivery_date", frappe.utils.nowdate()),
-                "uom": item.get("uom", "Nos"),
-                "warehouse": item.get("warehouse", "Stores - A"),
-            }
-        )
-
-    if not invoice_items:
-        return Response(
-            json.dumps({"error": "No valid items found for order."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
-    sales_team = []
-    if data.get("sales_man_name"):
-        sales_team.append(
-            {"sales_person": data.get("sales_man_name"), "allocated_percentage": 100}
-        )
-    existing_order = None
-    if data.get("order_id"):
-        existing_order = frappe.db.exists("Sales Order", {"name": data.get("order_id")})
-
-    if existing_order:
-
-        order = frappe.get_doc("Sales Order", existing_order)
-
-        order.discount_amount = data.get("discount_amount", order.discount_amount)
-        order.grand_total = data.get("total", order.grand_total)
-        order.coupon_code = data.get("promotion_code", order.coupon_code)
-        order.branch_id = data.get("branch_id", order.branch_id)
-        order.custom_orderby = data.get("orderby", order.custom_orderby)
-        order.address_display = data.get("address_display", order.address_display)
-        order.shipping_address = data.get("shipping_address", order.shipping_address)
-        order.custom_region = data.get("region", order.custom_region)
-        order.custom_payment_options = data.get(
-            "payment_options", order.custom_payment_options
-        )
-
-        order.set("items", [])
-        for item in invoice_items:
-            order.append("items", item)
+    try:
+        if cint(frappe.form_dict.get("async")):
+            job_id = enqueue_order("create_or_update_order", data)
+            return json_response(
+                {"message": "Order queued", "job_id": job_id}, status=202
+            )
+        message, order_data = save_order(data)
+    except InvalidOrder as e:
+        return error_response(str(e), 400)
 
-        order.set("sales_team", [])
-        for sales_person in sales_team:
-            order.append("sales_team", sales_person)
+    return json_response({"message": message, "data": order_data})
 
-        order.save(ignore_permissions=True)
-        message = "Sales Order updated successfully"
 
-    else:
+@frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
+def create_or_update_orders():
+    """
+    Create or update many orders in one request.
+
+    Each order is saved inside its own savepoint, so a failing order is
+    rolled back alone and reported in its result entry; the others are kept.
+    Work is committed every ``batch_size`` orders.
+    """
+    try:
+        data = json.loads(frappe.request.data)
+    except Exception as e:
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
-        order = frappe.get_doc(
-            {
-                "doctype": "Sales Order",
-                "customer": data.get("user_id"),
-                "items": invoice_items,
-                "discount_amount": data.get("discount_amount", 0),
-                "grand_total": data.get("total", 0),
-                "coupon_code": data.get("promotion_code"),
-                "custom_orderby": data.get("orderby", 1),
-                "custom_region": data.get("region", ""),
-                "address_display": data.get("address_display", ""),
-                "shipping_address": data.get("shipping_address", ""),
-                "sales_team": sales_team,
-                "custom_payment_options": data.get("payment_options", "COD"),
-            }
-        )
+    orders = data.get("orders") if isinstance(data, dict) else None
+    if not orders or not isinstance(orders, list):
+        return error_response("orders list is required.", 400)
 
-        order.insert(ignore_permissions=True)
-        message = "Sales Order created successfully"
+    max_orders = frappe.conf.get("jawad_bulk_order_limit") or BULK_ORDER_LIMIT
+    if len(orders) > max_orders:
+        return error_response(f"At most {max_orders} orders can be sent at once.", 400)
 
-    items_data = [
-        {
-            "item_code": i.item_code,
-            "qty": i.qty,
-            "rate": i.rate,
-            "uom": i.uom,
-            "warehouse": i.warehouse,
-        }
-        for i in order.items
-    ]
+    batch_size = cint(data.get("batch_size")) or BULK_ORDER_BATCH_SIZE
+    results = save_orders(orders, batch_size)
+    failed = sum(1 for result in results["results"] if result["status"] == "error")
 
-    sales_team_data = [
+    return json_response(
         {
-            "sales_person": st.sales_person,
-            "allocated_percentage": st.allocated_percentage,
+            "message": f"{len(orders) - failed} of {len(orders)} orders saved",
+            **results,
         }
-        for st in order.sales_team
-    ]
-
-    order_data = {
-        "name": order.name,
-        "customer": order.customer,
-        "grand_total": order.grand_total,
-        "total_qty": order.total_qty,
-        "discount_amount": order.discount_amount,
-        "status": order.status,
-        "items": items_data,
-        "sales_team": sales_team_data,
-        "coupon_code": order.coupon_code,
-        "orderby": order.custom_orderby,
-        "billing address": order.address_display,
-        "shipping_address": order.shipping_address,
-        "region": order.custom_region,
-        "payment_options": order.custom_payment_options,
-    }
-
-    return Response(
-        json.dumps({"message": message, "data": order_data}),
-        status=200,
-        mimetype="application/json",
     )
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_invoice():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     sales_order_id = data.get("sales_order")
     if not sales_order_id:
-        return Response(
-            json.dumps({"error": "Sales Order ID is required"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("Sales Order ID is required", 400)
 
     try:
 
@@ -785,12 +614,8 @@ def create_invoice():
             ],
         }
 
-        return Response(
-            json.dumps(
-                {"message": "Invoice created successfully", "data": response_data}
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {"message": "Invoice created successfully", "data": response_data}
         )
 
     except Exception as e:
@@ -799,15 +624,13 @@ def create_invoice():
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_brand():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     try:
 
@@ -847,48 +670,30 @@ def create_brand():
             ],
         }
 
-        return Response(
-            json.dumps(
-                {"message": "Brand created successfully", "data": response_data}
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {"message": "Brand created successfully", "data": response_data}
         )
 
     except Exception as e:
         frappe.log_error(str(e), "Create Brand Error")
-        return Response(
-            json.dumps({"error": f"Failed to create Brand: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Failed to create Brand: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def update_brand():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     brand_id = data.get("brand_id")
     if not brand_id:
-        return Response(
-            json.dumps({"error": "brand_id is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("brand_id is required.", 400)
 
     if not frappe.db.exists("Brand", brand_id):
-        return Response(
-            json.dumps({"error": f"Brand '{brand_id}' does not exist."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Brand '{brand_id}' does not exist.", 404)
 
     try:
         brand = frappe.get_doc("Brand", brand_id)
@@ -911,188 +716,278 @@ def update_brand():
             ],
         }
 
-        return Response(
-            json.dumps(
-                {"message": "Brand updated successfully", "data": response_data}
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {"message": "Brand updated successfully", "data": response_data}
         )
 
     except Exception as e:
         frappe.log_error(str(e), "Update Brand Error")
-        return Response(
-            json.dumps({"error": f"Failed to update Brand: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Failed to update Brand: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
-def get_brand_list(id=None):
+@instrument()
+@conditional(["Brand"], max_age=300)
+@cached("brands")
+def get_brand_list(id=None, limit=None, cursor=None, fields=None):
     try:
-        brands = frappe.get_all(
-            "Brand",
-            fields=["name", "brand", "description"],
-            order_by="creation desc",
-            filters={"name": id} if id else None,
+        brand = frappe.qb.DocType("Brand")
+        columns = {
+            "id": brand.name,
+            "brand_name": brand.brand,
+            "description": brand.description,
+        }
+        fields = parse_fields(fields, list(columns))
+        query = select_fields(frappe.qb.from_(brand), columns, fields)
+        if id:
+            query = query.where(brand.name == id)
+        query, page_size = paginate(
+            query,
+            brand.name,
+            sort_field=brand.creation,
+            order=Order.desc,
+            limit=limit,
+            cursor=cursor,
         )
-        if not brands:
-            return Response(
-                json.dumps({"error": "No brands found."}),
-                status=404,
-                mimetype="application/json",
-            )
-
-        response_data = [
-            {
-                "id": brand.name,
-                "brand_name": brand.brand,
-                "description": brand.description,
-            }
-            for brand in brands
-        ]
+        brands, next_cursor = split_page(query.run(as_dict=True), page_size)
+        if not brands and not cursor:
+            return error_response("No brands found.", 404)
 
-        return Response(
-            json.dumps({"data": response_data}),
-            status=200,
-            mimetype="application/json",
-        )
+        return json_response({"data": brands, "next_cursor": next_cursor})
 
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
     except Exception as e:
         frappe.log_error(str(e), "Brand List Error")
-        return Response(
-            json.dumps({"error": f"Failed to fetch brands: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Failed to fetch brands: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def delete_brand():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     brand_name = data.get("brand_name")
     if not brand_name:
-        return Response(
-            json.dumps({"error": "brand_name is required."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("brand_name is required.", 400)
 
     if not frappe.db.exists("Brand", brand_name):
-        return Response(
-            json.dumps({"error": f"Brand '{brand_name}' does not exist."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Brand '{brand_name}' does not exist.", 404)
 
     try:
 
         frappe.delete_doc("Brand", brand_name, ignore_permissions=True)
 
-        return Response(
-            json.dumps({"message": f"Brand '{brand_name}' deleted successfully."}),
-            status=200,
-            mimetype="application/json",
-        )
+        return json_response({"message": f"Brand '{brand_name}' deleted successfully."})
 
     except Exception as e:
         frappe.log_error(str(e), "Delete Brand Error")
-        return Response(
-            json.dumps({"error": f"Failed to delete Brand: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
+        return error_response(f"Failed to delete Brand: {str(e)}", 500)
+
+
+ITEM_CHILD_FIELDS = ("channelCatSubCat", "subcatimg")
+
+
+def attach_item_children(items, fields=ITEM_CHILD_FIELDS):
+    """
+    Add the ``channelCatSubCat`` and ``subcatimg`` lists to item rows keyed by
+    ``id``, with one query per child table for the whole batch. Child tables
+    missing from ``fields`` are not read.
+    """
+    if not items:
+        return items
+
+    item_names = [item["id"] for item in items]
+
+    if "channelCatSubCat" in fields:
+        channels_by_item = {}
+        for row in frappe.get_all(
+            "channelCatSubCat",
+            fields=["parent", "channelid", "categoryid", "subcategoryid"],
+            filters={
+                "parent": ["in", item_names],
+                "parenttype": "Item",
+                "parentfield": "custom_channelcatsubcat",
+            },
+            order_by="idx asc",
+        ):
+            channels_by_item.setdefault(row.pop("parent"), []).append(row)
+        for item in items:
+            item["channelCatSubCat"] = channels_by_item.get(item["id"], [])
+
+    if "subcatimg" in fields:
+        media_by_item = {}
+        for row in frappe.get_all(
+            "media",
+            fields=["parent", "media"],
+            filters={
+                "parent": ["in", item_names],
+                "parenttype": "Item",
+                "parentfield": "custom_subcatimg",
+            },
+            order_by="idx asc",
+        ):
+            media_by_item.setdefault(row.parent, []).append(row.media)
+        for item in items:
+            item["subcatimg"] = media_by_item.get(item["id"], [])
+
+    return items
+
+
+def get_channel_item_query(channelid=None, categoryid=None, subcategoryid=None):
+    """Return a query selecting the names of items linked to the given keys."""
+    link = frappe.qb.DocType("channelCatSubCat")
+    query = (
+        frappe.qb.from_(link)
+        .select(link.parent)
+        .where(link.parenttype == "Item")
+        .where(link.parentfield == "custom_channelcatsubcat")
+    )
+    for column, value in (
+        ("channelid", channelid),
+        ("categoryid", categoryid),
+        ("subcategoryid", subcategoryid),
+    ):
+        if value:
+            query = query.where(link.field(column) == value)
+    return query
+
+
+@frappe.whitelist(allow_guest=False)
+@instrument()
+@conditional(["Item", "channelCatSubCat", "media"], max_age=60)
+def get_item_list(
+    id=None,
+    limit=None,
+    cursor=None,
+    stream=None,
+    fields=None,
+    channelid=None,
+    categoryid=None,
+    subcategoryid=None,
+    brand=None,
+    company=None,
+):
+    """
+    Returns a page of items, optionally narrowed to a channel, category,
+    subcategory, brand or company.
+
+    Channel and category filters select the items through an ``IN``
+    subquery on ``channelCatSubCat``, which MariaDB runs as a semi-join
+    over that table's composite indexes, so only matching items are read.
+    """
+    try:
+        item_table = frappe.qb.DocType("Item")
+        columns = {
+            "id": item_table.name,
+            "item_code": item_table.item_code,
+            "item_name": item_table.item_name,
+            "description": item_table.description,
+            "nameAr": item_table.custom_name_arabic,
+            "nameHi": item_table.custom_namehi,
+            "nameUr": item_table.custom_nameur,
+            "descriptionAr": item_table.custom_descriptionar,
+            "descriptionHi": item_table.custom_descriptionhi,
+            "descriptionUr": item_table.custom_descriptionur,
+            "brand": item_table.custom_brand_id,
+        }
+        fields = parse_fields(fields, [*columns, *ITEM_CHILD_FIELDS])
+
+        def build_query():
+            query = select_fields(frappe.qb.from_(item_table), columns, fields)
+            if id:
+                query = query.where(item_table.name == id)
+            if brand:
+                query = query.where(item_table.custom_brand_id == brand)
+            if company:
+                query = query.where(item_table.custom_company == company)
+            if channelid or categoryid or subcategoryid:
+                query = query.where(
+                    item_table.name.isin(
+                        get_channel_item_query(channelid, categoryid, subcategoryid)
+                    )
+                )
+            return query
+
+        if cint(stream):
+            return stream_response(
+                item
+                for batch in iter_batches(build_query, item_table.name)
+                for item in attach_item_children(batch, fields)
+            )
+
+        query, page_size = paginate(
+            build_query(), item_table.name, limit=limit, cursor=cursor
         )
+        items, next_cursor = split_page(query.run(as_dict=True), page_size)
+        if not items and not cursor:
+            return error_response("No items found.", 404)
+        attach_item_children(items, fields)
+
+        return json_response({"data": items, "next_cursor": next_cursor})
+
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(f"Error: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
-def get_item_list(id=None):
+@instrument()
+def search_items(query=None, limit=None, cursor=None, fields=None):
+    """
+    Returns a page of items with a name, in any language, that has a word
+    starting with ``query``. Names that start with it come first.
+    """
     try:
+        item_table = frappe.qb.DocType("Item")
+        columns = {
+            "id": item_table.name,
+            "item_code": item_table.item_code,
+            "item_name": item_table.item_name,
+            "nameAr": item_table.custom_name_arabic,
+            "nameHi": item_table.custom_namehi,
+            "nameUr": item_table.custom_nameur,
+            "brand": item_table.custom_brand_id,
+            "image": item_table.image,
+        }
+        fields = parse_fields(fields, list(columns))
+        names, next_cursor = search_item_names(query, limit=limit, cursor=cursor)
 
-        filters = {}
-        if id:
-            filters["name"] = id
-
-        item_names = frappe.get_all("Item", filters=filters, pluck="name")
-        if not item_names:
-            return Response(
-                json.dumps({"error": "No items found."}),
-                status=404,
-                mimetype="application/json",
-            )
         items = []
-        for name in item_names:
-            item = frappe.get_doc("Item", name)
-
-            channel_catsubcats = [
-                {
-                    "channelid": row.channelid,
-                    "categoryid": row.categoryid,
-                    "subcategoryid": row.subcategoryid,
-                }
-                for row in item.custom_channelcatsubcat
-            ]
-
-            media_urls = [m.media for m in item.custom_subcatimg]
-
-            item_data = {
-                "id": item.name,
-                "item_code": item.item_code,
-                "item_name": item.item_name,
-                "description": item.description,
-                "nameAr": item.custom_name_arabic,
-                "nameHi": item.custom_namehi,
-                "nameUr": item.custom_nameur,
-                "descriptionAr": item.custom_descriptionar,
-                "descriptionHi": item.custom_descriptionhi,
-                "descriptionUr": item.custom_descriptionur,
-                "brand": item.custom_brand_id,
-                "channelCatSubCat": channel_catsubcats,
-                "subcatimg": media_urls,
+        if names:
+            items_by_name = {
+                item["id"]: item
+                for item in select_fields(frappe.qb.from_(item_table), columns, fields)
+                .where(item_table.name.isin(names))
+                .run(as_dict=True)
             }
+            items = [items_by_name[name] for name in names if name in items_by_name]
 
-            items.append(item_data)
-
-        return Response(
-            json.dumps({"data": items}),
-            status=200,
-            mimetype="application/json",
-        )
+        return json_response({"data": items, "next_cursor": next_cursor})
 
+    except (InvalidPageRequest, InvalidFieldsRequest, InvalidSearchRequest) as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Error: {str(e)}"}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(f"Error: {str(e)}", 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def update_customer():
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     customer_id = data.get("customer_email")
     if not customer_id:
-        return Response(
-            json.dumps({"error": "Missing required field: customer_email"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("Missing required field: customer_email", 400)
 
     try:
         customer_email = frappe.db.get_value(
@@ -1101,11 +996,7 @@ def update_customer():
         )
         customer = frappe.get_doc("Customer", customer_email)
     except frappe.DoesNotExistError:
-        return Response(
-            json.dumps({"error": f"Customer with ID {customer_id} not found."}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response(f"Customer with ID {customer_id} not found.", 404)
 
     update_values = {}
 
@@ -1135,11 +1026,7 @@ def update_customer():
         update_values["customer_primary_address"] = data.get("address")
 
     if not update_values:
-        return Response(
-            json.dumps({"error": "No valid fields provided for update."}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("No valid fields provided for update.", 400)
 
     customer.update(update_values)
     customer.save(ignore_permissions=True)
@@ -1165,8 +1052,4 @@ def update_customer():
 
     frappe.db.commit()
 
-    return Response(
-        json.dumps({"message": "Customer and User updated successfully."}),
-        status=200,
-        mimetype="application/json",
-    )
+    return json_response({"message": "Customer and User updated successfully."})
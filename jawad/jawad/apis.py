@@ -2,10 +2,36 @@ import frappe
 import base64
 from werkzeug.wrappers import Response, Request
 import json
-from frappe.utils import now_datetime
+from frappe.utils import cint, now_datetime
+from frappe.query_builder import Order
+
+from jawad.jawad.audit import record_login
+from jawad.jawad.cache import cached, get_stats
+from jawad.jawad.catalog import read_manifest
+from jawad.jawad.etag import conditional
+from jawad.jawad.fieldsets import InvalidFieldsRequest, parse_fields, select_fields
+from jawad.jawad.idempotency import idempotent
+from jawad.jawad.metrics import export as export_metrics, instrument
+from jawad.jawad.oauth import create_token, get_oauth_client
+from jawad.jawad.orders import (
+    InvalidOrder,
+    create_post_order,
+    enqueue_order,
+    get_dead_letters,
+    get_order_job,
+)
+from jawad.jawad.pagination import InvalidPageRequest, paginate, split_page
+from jawad.jawad.ratelimit import rate_limit
+from jawad.jawad.response import error_response, json_response
+from jawad.jawad.streaming import iter_query, stream_response
+from jawad.jawad.sync import SyncTokenExpired, get_changes
+from jawad.jawad.tokens import signed_token_fields
 
 
 @frappe.whitelist()  # pylint: disable=no-member
+@instrument()
+@conditional(["Item Group"], max_age=300)
+@cached("categories")
 def categories_List():
     """
     Returns a list of all categories.
@@ -14,134 +40,141 @@ def categories_List():
     doc = frappe.db.get_all(  # pylint: disable=no-member
         "Item Group", fields=["name as id ", "name"]
     )
-    return Response(json.dumps({"data": doc}), status=200, mimetype="application/json")
+    return json_response({"data": doc})
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def updated_or_newly_added_items():
+@instrument()
+def updated_or_newly_added_items(updated_at=None, sync_token=None, limit=None):
     """
-    Returns a list of updated or newly added products and customers since a given timestamp.
-    """
-    since = frappe.local.form_dict.get("updated_at")  # pylint: disable=no-member
-    if not since:
-        return Response(
-            json.dumps({"error": "Missing required parameter 'updated_at'"}),
-            status=400,
-            mimetype="application/json",
-        )
-
-    items = frappe.db.get_all(  # pylint: disable=no-member
-        "Item",
-        fields=["item_code", "item_name as product_name", "modified as updated_at"],
-        filters={"modified": [">=", since]},
-    )
-
-    customers = frappe.db.get_all(  # pylint: disable=no-member
-        "Customer",
-        fields=["name as id", "customer_name as name", "modified as updated_at"],
-        filters={"modified": [">=", since]},
-    )
+    Returns the products, customers, brands, item groups, branches and
+    promotions changed since the client's last sync, plus the ones deleted.
 
-    products = []
-    for item in items:
-        products.append(
-            {
-                "product_id": item["item_code"],  # assuming item_code is numeric
-                "product_name": item["product_name"],
-                "updated_at": str(item["updated_at"]),
-            }
-        )
-
-    # Build customer list
-    customers_list = []
-    for customer in customers:
-        customers_list.append(
-            {
-                "id": (
-                    (customer["id"])
-                    if str(customer["id"]).isdigit()
-                    else customer["id"]
-                ),
-                "name": customer["name"],
-                "updated_at": str(customer["updated_at"]),
-            }
+    The first call passes ``updated_at``; every later call passes the
+    ``sync_token`` from the previous response and repeats while ``has_more``.
+    """
+    if not updated_at and not sync_token:
+        return error_response(
+            "Missing required parameter 'updated_at' or 'sync_token'", 400
         )
 
-    result = {
-        "products": products,
-        "customers": customers_list,
-    }
+    try:
+        result = get_changes(sync_token=sync_token, updated_at=updated_at, limit=limit)
+    except SyncTokenExpired as e:
+        return error_response(str(e), 410)
+    except InvalidPageRequest as e:
+        return error_response(str(e), 400)
 
-    return Response(json.dumps(result), status=200, mimetype="application/json")
+    return json_response(result)
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def valid_promotion_list():
+@instrument()
+@conditional(["Promotional Scheme", "Promotional Scheme Price Discount"], max_age=60)
+@cached("promotions")
+def valid_promotion_list(limit=None, cursor=None, fields=None):
     """
-    Returns a list of valid promotions.
+    Returns a page of valid promotions, one row per price discount slab, or
+    one row per promotion when no slab field is requested.
     """
-    promotions = frappe.get_all(  # pylint: disable=no-member
-        "Promotional Scheme",
-        fields=[
-            "name",
-            "price_discount_slabs.rate_or_discount as percentage",
-            "price_discount_slabs.max_amount as value",
-            "valid_from",
-            "valid_upto",
-        ],
-        filters={"disable": 0},
-    )
-    for promotion in promotions:
-        promotion["valid_from"] = str(promotion["valid_from"])
-        promotion["valid_upto"] = str(promotion["valid_upto"])
-    return Response(
-        json.dumps({"data": promotions}), status=200, mimetype="application/json"
-    )
+    scheme = frappe.qb.DocType("Promotional Scheme")
+    columns = {
+        "name": scheme.name,
+        "valid_from": scheme.valid_from,
+        "valid_upto": scheme.valid_upto,
+    }
+    try:
+        fields = parse_fields(
+            fields,
+            ["name", "percentage", "value", "valid_from", "valid_upto"],
+            required=("name",),
+        )
+        query = select_fields(frappe.qb.from_(scheme), columns, fields).where(
+            scheme.disable == 0
+        )
+        query, page_size = paginate(query, scheme.name, limit=limit, cursor=cursor)
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
+    schemes, next_cursor = split_page(query.run(as_dict=True), page_size)
+
+    slab_fields = [field for field in ("percentage", "value") if field in fields]
+    slabs_by_scheme = {}
+    if schemes and slab_fields:
+        for slab in frappe.get_all(  # pylint: disable=no-member
+            "Promotional Scheme Price Discount",
+            fields=["parent", "rate_or_discount as percentage", "max_amount as value"],
+            filters={
+                "parent": ["in", [row.name for row in schemes]],
+                "parenttype": "Promotional Scheme",
+                "parentfield": "price_discount_slabs",
+            },
+            order_by="idx asc",
+        ):
+            slabs_by_scheme.setdefault(slab.parent, []).append(slab)
+
+    promotions = []
+    for promotion in schemes:
+        # a scheme without slabs is still listed, like the old left join did
+        for slab in slabs_by_scheme.get(promotion.name) or [frappe._dict()]:
+            promotions.append(
+                {
+                    field: slab.get(field) if field in slab_fields else promotion[field]
+                    for field in fields
+                }
+            )
+    return json_response({"data": promotions, "next_cursor": next_cursor})
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def customer_list():
+@instrument()
+@conditional(["Customer"])
+def customer_list(limit=None, cursor=None, stream=None, fields=None):
     """
-    Returns a list of all customers.
+    Returns a page of customers ordered by id, or every customer as a
+    streamed response when ``stream`` is set.
     """
-    customers = frappe.get_all(  # pylint: disable=no-member
-        "Customer",
-        fields=[
-            "name as id",
-            "customer_name as name",
-            "mobile_no as phone",
-            "email_id as email",
-        ],
-    )
-    return Response(
-        json.dumps({"data": customers}), status=200, mimetype="application/json"
-    )
+    customer = frappe.qb.DocType("Customer")
+    columns = {
+        "id": customer.name,
+        "name": customer.customer_name,
+        "phone": customer.mobile_no,
+        "email": customer.email_id,
+    }
+    try:
+        fields = parse_fields(fields, list(columns))
+    except InvalidFieldsRequest as e:
+        return error_response(str(e), 400)
+    query = select_fields(frappe.qb.from_(customer), columns, fields)
+    if cint(stream):
+        return stream_response(iter_query(query.orderby(customer.name)))
+
+    try:
+        query, page_size = paginate(query, customer.name, limit=limit, cursor=cursor)
+    except InvalidPageRequest as e:
+        return error_response(str(e), 400)
+    customers, next_cursor = split_page(query.run(as_dict=True), page_size)
+    return json_response({"data": customers, "next_cursor": next_cursor})
 
 
 import json
 
 
 @frappe.whitelist(allow_guest=True)
+@instrument()
+@rate_limit("create_customer", {"ip": (20, 3600), "phone": (5, 3600)})
+@idempotent()
 def create_customer():
 
     try:
         data = json.loads(frappe.request.data)
     except Exception as e:
-        return Response(
-            json.dumps({"error": f"Invalid JSON input: {str(e)}"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response(f"Invalid JSON input: {str(e)}", 400)
 
     required_fields = ["name", "phone", "email", "country_code"]
     missing_fields = [field for field in required_fields if not data.get(field)]
     if missing_fields:
-        return Response(
-            json.dumps(
-                {"error": f"Missing required fields: {', '.join(missing_fields)}"}
-            ),
-            status=400,
-            mimetype="application/json",
+        return error_response(
+            f"Missing required fields: {', '.join(missing_fields)}", 400
         )
 
     existing_customer = frappe.get_all(
@@ -245,24 +278,71 @@ def create_customer():
         },
     }
 
+    return json_response({"message": message, "data": response_data})
+
+
+@frappe.whitelist()  # pylint: disable=no-member
+@instrument()
+def cache_stats():
+    """
+    Returns the hit and miss counters of the master-data cache.
+    """
+    frappe.only_for("System Manager")
+    return json_response({"data": get_stats()})
+
+
+@frappe.whitelist()  # pylint: disable=no-member
+@instrument()
+def catalog_manifest(channel=None, language=None):
+    """
+    Returns the manifest of the catalog snapshot files, optionally narrowed
+    to one channel and language. The files themselves are static assets.
+    """
+    manifest = read_manifest()
+    if not manifest:
+        return error_response("No catalog snapshot has been built yet", 404)
+
+    channels = manifest["channels"]
+    if channel:
+        channels = {channel: channels[channel]} if channel in channels else {}
+    if language:
+        channels = {
+            name: {language: languages[language]}
+            for name, languages in channels.items()
+            if language in languages
+        }
+    if not channels:
+        return error_response("No catalog snapshot for this channel or language", 404)
+
+    return json_response(
+        {**manifest, "channels": channels},
+        headers={"Cache-Control": "private, max-age=60"},
+    )
+
+
+@frappe.whitelist()  # pylint: disable=no-member
+def metrics():
+    """
+    Returns per-endpoint latency, query and payload metrics in the
+    Prometheus text format.
+    """
+    frappe.only_for("System Manager")
     return Response(
-        json.dumps({"message": message, "data": response_data}),
+        export_metrics(),
         status=200,
-        mimetype="application/json",
+        mimetype="text/plain; version=0.0.4",
     )
 
 
 @frappe.whitelist()  # pylint: disable=no-member
+@instrument()
+@idempotent()
 def update_customer(name, phone):
     """
     Updates an existing customer's phone number based on name.
     """
     if not name or not phone:
-        return Response(
-            json.dumps({"error": "Missing required parameters: name, phone"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("Missing required parameters: name, phone", 400)
 
     customer = frappe.get_list(  # pylint: disable=no-member
         "Customer",
@@ -272,11 +352,7 @@ def update_customer(name, phone):
     )
 
     if not customer:
-        return Response(
-            json.dumps({"error": "Customer not found"}),
-            status=404,
-            mimetype="application/json",
-        )
+        return error_response("Customer not found", 404)
 
     customer_name = customer[0]["name"]
 
@@ -286,14 +362,11 @@ def update_customer(name, phone):
 
     # Commit the transaction to save changes
 
-    return Response(
-        json.dumps({"message": "Customer phone number updated successfully"}),
-        status=200,
-        mimetype="application/json",
-    )
+    return json_response({"message": "Customer phone number updated successfully"})
 
 
 @frappe.whitelist()  # pylint: disable=no-member
+@instrument()
 def parse_json_field(field):
     try:
         return json.loads(field) if isinstance(field, str) else field
@@ -302,186 +375,250 @@ def parse_json_field(field):
 
 
 @frappe.whitelist(allow_guest=True)  # pylint: disable=no-member
+@instrument()
+@rate_limit("post_order", {"ip": (120, 60), "customer_id": (30, 60)})
+@idempotent()
 def post_order(customer_id, branch_id, promotion_code, total):
     """Creates a new order for the given customer with the specified items."""
 
     if not customer_id:
-        return Response(
-            json.dumps({"error": "Missing required parameters: customer_id, items"}),
-            status=400,
-            mimetype="application/json",
-        )
+        return error_response("Missing required parameters: customer_id, items", 400)
 
     try:
         items = parse_json_field(
             frappe.form_dict.get("items")  # pylint: disable=no-member
         )
+        order = {
+            "customer_id": customer_id,
+            "branch_id": branch_id,
+            "promotion_code": promotion_code,
+            "total": total,
+            "items": items,
+        }
 
-        invoice_items = [
-            {
-                "item_code": (
-                    item["product_id"]
-                    if frappe.get_value(  # pylint: disable=no-member
-                        "Item", {"name": item["product_id"]}, "name"
-                    )
-                    else None
-                ),
-                "qty": item.get("quantity", 0),
-                "rate": item.get("price", 0),
-                "delivery_date": item.get(
-                    "delivery_date",
-                    frappe.utils.nowdate(),  # pylint: disable=no-member
-                ),
-                "uom": item.get("uom", "Nos"),
-                "warehouse": item.get("warehouse", "All Warehouses - erp"),
-            }
-            for item in items
-        ]
-        order = frappe.get_doc(  # pylint: disable=no-member
-            {
-                "doctype": "Sales Order",
-                "customer": customer_id,
-                "items": invoice_items,
-                "coupon_code": promotion_code,
-                "branch_id": branch_id,
-                "total1": total,
-            }
-        )
-        order.insert(ignore_permissions=True)
-        return Response(
-            json.dumps({"message": "Order created successfully", "id": order.name}),
-            status=200,
-            mimetype="application/json",
-        )
+        if cint(frappe.form_dict.get("async")):  # pylint: disable=no-member
+            job_id = enqueue_order("post_order", order)
+            return json_response(
+                {"message": "Order queued", "job_id": job_id}, status=202
+            )
+
+        name = create_post_order(**order)
+        return json_response({"message": "Order created successfully", "id": name})
+    except InvalidOrder as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(str(e), 500)
+
+
+@frappe.whitelist(allow_guest=True)  # pylint: disable=no-member
+@instrument()
+def order_job_status(job_id):
+    """
+    Returns the status of an order queued with ``async=1``, and its result
+    once the order has been saved.
+    """
+    job = get_order_job(job_id)
+    if not job or job["user"] not in ("Guest", frappe.session.user):
+        return error_response("Order job not found", 404)
+
+    return json_response(
+        {
+            "job_id": job_id,
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "result": job.get("result"),
+            "error": job.get("error"),
+        }
+    )
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def order_list(customer_id):
+@instrument()
+def order_dead_letters(start=0, count=100):
     """
-    Returns a list of all orders.
+    Returns queued orders that could not be inserted after all retries.
     """
-    try:
-        orders = frappe.get_all(  # pylint: disable=no-member
-            "Sales Order",
-            fields=[
-                "name as id",
-                "delivery_date as date",
-                "grand_total as total",
-            ],
-            filters={"customer": customer_id},
-            order_by="creation desc",
-        )
-        for order in orders:
-            order["date"] = str(order["date"])
-        return Response(
-            json.dumps({"data": orders}), status=200, mimetype="application/json"
-        )
-    except Exception as e:
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+    frappe.only_for("System Manager")
+    return json_response({"data": get_dead_letters(cint(start), cint(count) or 100)})
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def branches_list():
+@instrument()
+@conditional(["Sales Order"], filters={"Sales Order": {"customer": "customer_id"}})
+def order_list(customer_id, limit=None, cursor=None, fields=None):
     """
-    Returns a list of all branches.
+    Returns a page of the customer's orders, newest first.
     """
     try:
-        branches = frappe.get_all(  # pylint: disable=no-member
-            "Branch",
-            fields=["name as id", "branch as name", "city"],
-        )
-        return Response(
-            json.dumps({"data": branches}), status=200, mimetype="application/json"
-        )
+        sales_order = frappe.qb.DocType("Sales Order")
+        columns = {
+            "id": sales_order.name,
+            "date": sales_order.delivery_date,
+            "total": sales_order.grand_total,
+        }
+        fields = parse_fields(fields, list(columns))
+        query = select_fields(frappe.qb.from_(sales_order), columns, fields).where(
+            sales_order.customer == customer_id
+        )
+        query, page_size = paginate(
+            query,
+            sales_order.name,
+            sort_field=sales_order.creation,
+            order=Order.desc,
+            limit=limit,
+            cursor=cursor,
+        )
+        orders, next_cursor = split_page(query.run(as_dict=True), page_size)
+        return json_response({"data": orders, "next_cursor": next_cursor})
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(str(e), 500)
 
 
 @frappe.whitelist()  # pylint: disable=no-member
-def product_list(product_id=None):
+@instrument()
+@conditional(["Branch"], max_age=300)
+@cached("branches")
+def branches_list(limit=None, cursor=None, fields=None):
     """
-    Returns product details (optionally filtered by product_id).
+    Returns a page of branches ordered by id.
     """
     try:
-        products = frappe.get_all(  # pylint: disable=no-member
-            "Item",
-            fields=["name", "item_name", "item_code", "standard_rate", "image", "sku"],
-            filters={"name": product_id} if product_id else None,
-        )
+        branch = frappe.qb.DocType("Branch")
+        columns = {"id": branch.name, "name": branch.branch, "city": branch.city}
+        fields = parse_fields(fields, list(columns))
+        query = select_fields(frappe.qb.from_(branch), columns, fields)
+        query, page_size = paginate(query, branch.name, limit=limit, cursor=cursor)
+        branches, next_cursor = split_page(query.run(as_dict=True), page_size)
+        return json_response({"data": branches, "next_cursor": next_cursor})
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return error_response(str(e), 500)
 
-        product_list_data = []
 
-        for product in products:
-            # Fetch media gallery
-            media_list = [
-                media.get("media")
-                for media in frappe.get_all(  # pylint: disable=no-member
-                    "media", filters={"parent": product.name}, fields=["media"]
-                )
-            ]
+@frappe.whitelist()  # pylint: disable=no-member
+@instrument()
+@conditional(["Item", "media", "branch doc", "Item Price", "Branch"], max_age=60)
+def product_list(product_id=None, limit=None, cursor=None, fields=None):
+    """
+    Returns a page of product details (optionally filtered by product_id).
 
-            branches_inventory = []
-            branch_stocks = frappe.get_all(  # pylint: disable=no-member
+    Media, branch rows, prices and branches are loaded with one bulk query
+    each and stitched together in memory, so the number of queries does not
+    grow with the number of products. Queries for fields left out of
+    ``fields`` are skipped. The body stays a plain list; the cursor of the
+    next page is sent in the ``X-Next-Cursor`` header.
+    """
+    try:
+        item = frappe.qb.DocType("Item")
+        columns = {
+            "product_id": item.name,
+            "product_name": item.item_name,
+            "sku": item.sku,
+            "main_image": item.image,
+        }
+        fields = parse_fields(
+            fields,
+            [
+                "product_id",
+                "product_name",
+                "sku",
+                "price",
+                "main_image",
+                "media",
+                "branches_inventory",
+            ],
+            required=("product_id",),
+        )
+        query = select_fields(frappe.qb.from_(item), columns, fields)
+        if product_id:
+            query = query.where(item.name == product_id)
+        query, page_size = paginate(query, item.name, limit=limit, cursor=cursor)
+        products, next_cursor = split_page(query.run(as_dict=True), page_size)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+        if not products:
+            return json_response([], headers=headers)
+
+        product_names = [product.product_id for product in products]
+
+        media_by_item = {}
+        if "media" in fields:
+            for media in frappe.get_all(  # pylint: disable=no-member
+                "media",
+                filters={"parent": ["in", product_names]},
+                fields=["parent", "media"],
+            ):
+                media_by_item.setdefault(media.parent, []).append(media.media)
+
+        branch_rows_by_item = {}
+        if "branches_inventory" in fields:
+            for row in frappe.get_all(  # pylint: disable=no-member
                 "branch doc",
-                fields=["branch as branch_id"],
-                filters={"parent": product.name, "parenttype": "Item"},
-            )
-            item_price = frappe.get_value(  # pylint: disable=no-member
-                "Item Price", {"item_code": product.name}, "price_list_rate"
-            )
-            for stock in branch_stocks:
-                branch_name = frappe.get_value(  # pylint: disable=no-member
+                fields=["parent", "branch as branch_id"],
+                filters={"parent": ["in", product_names], "parenttype": "Item"},
+            ):
+                branch_rows_by_item.setdefault(row.parent, []).append(row.branch_id)
+
+        # keep the first price per item, in the same order get_value would pick it
+        price_by_item = {}
+        if "price" in fields:
+            for price in frappe.get_all(  # pylint: disable=no-member
+                "Item Price",
+                fields=["item_code", "price_list_rate"],
+                filters={"item_code": ["in", product_names]},
+            ):
+                price_by_item.setdefault(price.item_code, price.price_list_rate)
+
+        branch_ids = {
+            branch_id
+            for branch_ids in branch_rows_by_item.values()
+            for branch_id in branch_ids
+        }
+        branches = {}
+        if branch_ids:
+            branches = {
+                branch.name: branch
+                for branch in frappe.get_all(  # pylint: disable=no-member
                     "Branch",
-                    {"name": stock.branch_id},
-                    ["warehouse", "branch", "stock"],
-                    as_dict=True,
+                    fields=["name", "warehouse", "branch", "stock"],
+                    filters={"name": ["in", list(branch_ids)]},
                 )
+            }
 
-                branches_inventory.append(
-                    {
-                        "branch_id": stock.branch_id,
-                        "branch_name": branch_name.branch,
-                        "warehouse_name": branch_name.warehouse,  # Or fetch from somewhere if available
-                        "stock": branch_name.stock,  # Or fetch from Bin doctype if available
-                    }
-                )
+        product_list_data = []
 
-            product_list_data.append(
-                {
-                    "product_id": int(product.name),
-                    "product_name": product.item_name,
-                    "sku": int(product.sku),
-                    "price": item_price,
-                    "main_image": product.image,
-                    "media": media_list,
-                    "branches_inventory": branches_inventory,
-                }
-            )
+        for product in products:
+            name = product.product_id
+            values = dict(product, product_id=int(name))
+            if "sku" in fields:
+                values["sku"] = int(product.sku)
+            if "price" in fields:
+                values["price"] = price_by_item.get(name)
+            if "media" in fields:
+                values["media"] = media_by_item.get(name, [])
+            if "branches_inventory" in fields:
+                values["branches_inventory"] = []
+                for branch_id in branch_rows_by_item.get(name, []):
+                    branch = branches.get(branch_id) or frappe._dict()
+                    values["branches_inventory"].append(
+                        {
+                            "branch_id": branch_id,
+                            "branch_name": branch.branch,
+                            "warehouse_name": branch.warehouse,
+                            "stock": branch.stock,
+                        }
+                    )
 
-        return Response(
-            json.dumps(product_list_data), status=200, mimetype="application/json"
-        )
+            product_list_data.append({field: values[field] for field in fields})
+
+        return json_response(product_list_data, headers=headers)
 
+    except (InvalidPageRequest, InvalidFieldsRequest) as e:
+        return error_response(str(e), 400)
     except Exception as e:
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(str(e), 500)
 
 
 from frappe.auth import LoginManager  # pylint: disable=no-member
@@ -489,6 +626,7 @@ from frappe import _
 
 
 @frappe.whitelist()
+@instrument()
 def custom_login(usr, pwd):
     try:
         login_manager = LoginManager()
@@ -515,45 +653,30 @@ def custom_login(usr, pwd):
         return {"message": f"Error: {str(e)}"}
 
 
-import requests
-
-
 @frappe.whitelist(allow_guest=True)
+@instrument()
+@rate_limit("login", {"ip": (30, 60), "api_key": (10, 300), "app_key": (1200, 60)})
 def generate_token_secure(api_key, api_secret, app_key):
     # frappe.log_error(title='Login attempt',message=str(api_key) + str(api_secret) + str(app_key + "  "))
     try:
         try:
             app_key = base64.b64decode(app_key).decode("utf-8")
         except Exception as e:
-            return Response(
-                json.dumps(
-                    {"message": "Security Parameters are not valid", "user_count": 0}
-                ),
+            return json_response(
+                {"message": "Security Parameters are not valid", "user_count": 0},
                 status=401,
-                mimetype="application/json",
             )
-        clientID, clientSecret, clientUser = frappe.db.get_value(
-            "OAuth Client",
-            {"app_name": app_key},
-            ["client_id", "client_secret", "user"],
-        )
+        clientID, clientSecret, clientUser = get_oauth_client(app_key)
 
         if clientID is None:
             # return app_key
-            return Response(
-                json.dumps(
-                    {"message": "Security Parameters are not valid", "user_count": 0}
-                ),
+            return json_response(
+                {"message": "Security Parameters are not valid", "user_count": 0},
                 status=401,
-                mimetype="application/json",
             )
 
         client_id = clientID  # Replace with your OAuth client ID
         client_secret = clientSecret  # Replace with your OAuth client secret
-        url = (
-            frappe.local.conf.host_name
-            + "/api/method/frappe.integrations.oauth2.get_token"
-        )
         payload = {
             "username": api_key,
             "password": api_secret,
@@ -562,72 +685,49 @@ def generate_token_secure(api_key, api_secret, app_key):
             "client_secret": client_secret,
             # "grant_type": "refresh_token"
         }
-        files = []
-        headers = {"Content-Type": "application/json"}
-        response = requests.request("POST", url, data=payload, files=files)
-        if response.status_code == 200:
-            result_data = json.loads(response.text)
-            return Response(
-                json.dumps({"data": result_data}),
-                status=200,
-                mimetype="application/json",
-            )
+        status, result_data = create_token(payload)
+        if status == 200:
+            result_data.update(signed_token_fields(result_data))
+            return json_response({"data": result_data})
 
         else:
             frappe.local.response.http_status_code = 401
-            return json.loads(response.text)
+            return result_data
 
     except Exception as e:
         # frappe.local.response.http_status_code = 401
         # return json.loads(response.text)
-        return Response(
-            json.dumps({"message": e, "user_count": 0}),
-            status=500,
-            mimetype="application/json",
-        )
+        return json_response({"message": e, "user_count": 0}, status=500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
 def generate_token_secure_for_users(username, password, app_key):
 
     # return Response(json.dumps({"message": "2222 Security Parameters are not valid" , "user_count": 0}), status=401, mimetype='application/json')
-    frappe.log_error(
-        title="Login attempt",
-        message=str(username) + "    " + str(password) + "    " + str(app_key + "  "),
-    )
     try:
         try:
             app_key = base64.b64decode(app_key).decode("utf-8")
         except Exception as e:
-            return Response(
-                json.dumps(
-                    {"message": "Security Parameters are not valid", "user_count": 0}
-                ),
+            record_login("generate_token_secure_for_users", username, "Invalid App Key")
+            return json_response(
+                {"message": "Security Parameters are not valid", "user_count": 0},
                 status=401,
-                mimetype="application/json",
             )
-        clientID, clientSecret, clientUser = frappe.db.get_value(
-            "OAuth Client",
-            {"app_name": app_key},
-            ["client_id", "client_secret", "user"],
-        )
+        clientID, clientSecret, clientUser = get_oauth_client(app_key)
 
         if clientID is None:
             # return app_key
-            return Response(
-                json.dumps(
-                    {"message": "Security Parameters are not valid", "user_count": 0}
-                ),
+            record_login(
+                "generate_token_secure_for_users", username, "Invalid App Key", app_key
+            )
+            return json_response(
+                {"message": "Security Parameters are not valid", "user_count": 0},
                 status=401,
-                mimetype="application/json",
             )
 
         client_id = clientID  # Replace with your OAuth client ID
         client_secret = clientSecret  # Replace with your OAuth client secret
-        url = (
-            frappe.local.conf.host_name
-            + "/api/method/frappe.integrations.oauth2.get_token"
-        )
         payload = {
             "username": username,
             "password": password,
@@ -636,78 +736,60 @@ def generate_token_secure_for_users(username, password, app_key):
             "client_secret": client_secret,
             # "grant_type": "refresh_token"
         }
-        files = []
-        headers = {"Content-Type": "application/json"}
-        response = requests.request("POST", url, data=payload, files=files)
+        status, response_data = create_token(payload)
+        record_login(
+            "generate_token_secure_for_users",
+            username,
+            "Success" if status == 200 else "Failed",
+            app_key,
+        )
         # var = frappe.get_list("Customer", fields=["name as id", "full_name","email", "mobile_no as phone",], filters={'name': ['like', username]})
 
-        if response.status_code == 200:
-            response_data = json.loads(response.text)
-
+        if status == 200:
+            response_data.update(signed_token_fields(response_data))
             result = {
                 "token": response_data,
             }
-            return Response(
-                json.dumps({"data": result}), status=200, mimetype="application/json"
-            )
+            return json_response({"data": result})
         else:
 
             frappe.local.response.http_status_code = 401
-            return json.loads(response.text)
+            return response_data
 
     except Exception as e:
+        record_login("generate_token_secure_for_users", username, "Error", app_key)
         # frappe.local.response.http_status_code = 401
         # return json.loads(response.text)
-        return Response(
-            json.dumps({"message": e, "user_count": 0}),
-            status=500,
-            mimetype="application/json",
-        )
+        return json_response({"message": e, "user_count": 0}, status=500)
 
 
 @frappe.whitelist(allow_guest=True)
+@instrument()
+@rate_limit("refresh_token", {"ip": (60, 60)})
 def create_refresh_token(refresh_token):
-    url = (
-        frappe.local.conf.host_name + "/api/method/frappe.integrations.oauth2.get_token"
-    )
-    payload = f"grant_type=refresh_token&refresh_token={refresh_token}"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    files = []
-
-    response = requests.post(url, headers=headers, data=payload, files=files)
-
-    if response.status_code == 200:
-        try:
-
-            message_json = json.loads(response.text)
-
-            new_message = {
-                "access_token": message_json["access_token"],
-                "expires_in": message_json["expires_in"],
-                "token_type": message_json["token_type"],
-                "scope": message_json["scope"],
-                "refresh_token": message_json["refresh_token"],
-            }
+    payload = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+
+    status, message_json = create_token(payload)
+
+    if status == 200:
+        new_message = {
+            "access_token": message_json["access_token"],
+            "expires_in": message_json["expires_in"],
+            "token_type": message_json["token_type"],
+            "scope": message_json["scope"],
+            "refresh_token": message_json["refresh_token"],
+            **signed_token_fields(message_json),
+        }
 
-            return Response(
-                json.dumps({"data": new_message}),
-                status=200,
-                mimetype="application/json",
-            )
-        except json.JSONDecodeError as e:
-            return Response(
-                json.dumps({"data": f"Error decoding JSON: {e}"}),
-                status=401,
-                mimetype="application/json",
-            )
+        return json_response({"data": new_message})
     else:
 
-        return Response(
-            json.dumps({"data": response.text}), status=401, mimetype="application/json"
-        )
+        return json_response({"data": json.dumps(message_json)}, status=401)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_promotional_scheme():
     """
     Creates a new promotional scheme, with table data based on 'Apply On'
@@ -794,26 +876,20 @@ def create_promotional_scheme():
 
         saved_scheme = frappe.get_doc("Promotional Scheme", scheme.name)
 
-        return Response(
-            json.dumps(
-                {
-                    "message": "Promotional scheme created successfully",  # this returns complete doc as dictionary including child tables
-                },
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {
+                "message": "Promotional scheme created successfully",  # this returns complete doc as dictionary including child tables
+            }
         )
 
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "Create Promotional Scheme Error")
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(str(e), 500)
 
 
 @frappe.whitelist(allow_guest=False)
+@instrument()
+@idempotent()
 def create_pos_offer():
     """
     Creates a new POS offer.
@@ -858,21 +934,13 @@ def create_pos_offer():
 
         saved_offer = frappe.get_doc("POS Offer", pos_offer.name)
 
-        return Response(
-            json.dumps(
-                {
-                    "message": "POS offer created successfully",
-                    "data": saved_offer.as_dict(),
-                },
-            ),
-            status=200,
-            mimetype="application/json",
+        return json_response(
+            {
+                "message": "POS offer created successfully",
+                "data": saved_offer.as_dict(),
+            }
         )
 
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "Create POS Offer Error")
-        return Response(
-            json.dumps({"error": str(e)}),
-            status=500,
-            mimetype="application/json",
-        )
+        return error_response(str(e), 500)
@@ -0,0 +1,102 @@
+"""
+Login audit trail.
+
+Login attempts are recorded without credentials: user name, outcome, app
+name, client IP and endpoint only. Each event is pushed as JSON onto a Redis
+list during the request. The ``all`` scheduler job drains the list into
+``Login Audit Log`` with multi-row inserts, so a login never waits on a
+table write.
+
+Failed attempts are always kept. Successful ones are sampled with
+``jawad_login_audit_sample_rate`` (1 keeps all of them), and rows older than
+``jawad_login_audit_days`` are purged daily.
+"""
+
+import json
+import random
+
+import frappe
+from frappe.utils import add_days, cstr, now, now_datetime
+
+AUDIT_QUEUE = "jawad:login_audit"
+FLUSH_BATCH_SIZE = 1000
+# keep Redis bounded when the scheduler is down
+MAX_QUEUED_EVENTS = 100000
+RETENTION_DAYS = 30
+
+SUCCESS = "Success"
+AUDIT_FIELDS = ("username", "status", "app_name", "ip_address", "endpoint")
+
+
+def record_login(endpoint, username, status, app_name=None):
+    """Queue a login attempt for the audit log, subject to sampling."""
+    if status == SUCCESS and random.random() >= _get_sample_rate():
+        return
+
+    event = {
+        "creation": now(),
+        "username": cstr(username)[:140],
+        "status": status,
+        "app_name": cstr(app_name)[:140],
+        "ip_address": cstr(getattr(frappe.local, "request_ip", None)),
+        "endpoint": endpoint,
+    }
+    cache = frappe.cache()
+    cache.lpush(AUDIT_QUEUE, json.dumps(event))
+    cache.ltrim(AUDIT_QUEUE, 0, MAX_QUEUED_EVENTS - 1)
+
+
+def flush_login_audit():
+    """Scheduled job: move queued login events into ``Login Audit Log``."""
+    cache = frappe.cache()
+    key = cache.make_key(AUDIT_QUEUE)
+    while True:
+        # events are pushed at the head, so the oldest batch is at the tail
+        pipeline = cache.pipeline()
+        pipeline.lrange(key, -FLUSH_BATCH_SIZE, -1)
+        pipeline.ltrim(key, 0, -FLUSH_BATCH_SIZE - 1)
+        raw_events, _ = pipeline.execute()
+        if not raw_events:
+            break
+
+        try:
+            _insert_events([json.loads(raw) for raw in reversed(raw_events)])
+        except Exception:
+            frappe.db.rollback()
+            # put the batch back at the tail, in its original order
+            cache.pipeline().rpush(key, *raw_events).execute()
+            raise
+        frappe.db.commit()
+
+        if len(raw_events) < FLUSH_BATCH_SIZE:
+            break
+
+
+def _insert_events(events):
+    frappe.db.bulk_insert(
+        "Login Audit Log",
+        fields=["creation", "modified", "owner", "modified_by", *AUDIT_FIELDS],
+        values=[
+            (
+                event["creation"],
+                event["creation"],
+                "Administrator",
+                "Administrator",
+                *(event[field] for field in AUDIT_FIELDS),
+            )
+            for event in events
+        ],
+    )
+
+
+def purge_login_audit():
+    """Daily job: drop audit rows older than the retention window."""
+    days = frappe.conf.get("jawad_login_audit_days") or RETENTION_DAYS
+    frappe.db.delete(
+        "Login Audit Log", {"creation": ["<", add_days(now_datetime(), -days)]}
+    )
+
+
+def _get_sample_rate():
+    rate = frappe.conf.get("jawad_login_audit_sample_rate")
+    return 1.0 if rate is None else float(rate)
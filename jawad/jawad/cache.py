@@ -0,0 +1,130 @@
+"""
+Read-through Redis cache for master-data endpoints.
+
+Responses are stored under a per-namespace version number. Saving, deleting
+or renaming a document of a watched doctype bumps that version through
+``doc_events`` in ``hooks.py``, so every response built from the old data
+becomes unreachable at once and simply expires with its TTL.
+"""
+
+import functools
+import hashlib
+import json
+
+import frappe
+from werkzeug.wrappers import Response
+
+DEFAULT_TTL = 6 * 60 * 60
+
+# namespace -> doctypes whose changes invalidate it
+CACHE_NAMESPACES = {
+    "categories": ("Item Group",),
+    "branches": ("Branch",),
+    "brands": ("Brand",),
+    "promotions": ("Promotional Scheme",),
+}
+
+STATS_KEY = "jawad:cache:stats"
+CACHED_HEADERS = ("X-Next-Cursor",)
+
+
+def cached(namespace, ttl=None):
+    """
+    Cache the successful responses of a whitelisted endpoint, keyed by its
+    arguments, until a document in one of the namespace's doctypes changes.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = frappe.cache()
+            key = _response_key(namespace, args, kwargs)
+
+            entry = cache.get_value(key)
+            if entry:
+                _count(namespace, "hits")
+                return Response(
+                    entry["body"],
+                    status=entry["status"],
+                    headers=entry["headers"],
+                    mimetype="application/json",
+                )
+
+            _count(namespace, "misses")
+            response = fn(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set_value(
+                    key,
+                    {
+                        "body": response.get_data(),
+                        "status": response.status_code,
+                        "headers": {
+                            header: response.headers[header]
+                            for header in CACHED_HEADERS
+                            if header in response.headers
+                        },
+                    },
+                    expires_in_sec=ttl
+                    or frappe.conf.get("jawad_cache_ttl")
+                    or DEFAULT_TTL,
+                )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def invalidate(doc, method=None, *args, **kwargs):
+    """``doc_events`` hook: drop every cached response built from ``doc.doctype``."""
+    namespaces = [
+        namespace
+        for namespace, doctypes in CACHE_NAMESPACES.items()
+        if doc.doctype in doctypes
+    ]
+    for namespace in namespaces:
+        _bump_version(namespace)
+        # a reader may refill the cache from the old rows before this
+        # transaction commits, so bump once more when it does
+        frappe.db.after_commit.add(functools.partial(_bump_version, namespace))
+
+
+def get_stats():
+    cache = frappe.cache()
+    keys = [
+        (namespace, counter)
+        for namespace in CACHE_NAMESPACES
+        for counter in ("hits", "misses")
+    ]
+    values = cache.mget([_stats_key(*key) for key in keys])
+    stats = {namespace: {} for namespace in CACHE_NAMESPACES}
+    for (namespace, counter), value in zip(keys, values):
+        stats[namespace][counter] = int(value or 0)
+    return stats
+
+
+def _response_key(namespace, args, kwargs):
+    digest = hashlib.sha1(
+        json.dumps([args, kwargs], sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"jawad:cache:{namespace}:{_get_version(namespace)}:{digest}"
+
+
+def _version_key(namespace):
+    return frappe.cache().make_key(f"jawad:cache:version:{namespace}")
+
+
+def _get_version(namespace):
+    return int(frappe.cache().get(_version_key(namespace)) or 0)
+
+
+def _bump_version(namespace):
+    frappe.cache().incr(_version_key(namespace))
+
+
+def _stats_key(namespace, counter):
+    return frappe.cache().make_key(f"{STATS_KEY}:{namespace}:{counter}")
+
+
+def _count(namespace, counter):
+    frappe.cache().incr(_stats_key(namespace, counter))
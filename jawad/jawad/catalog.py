@@ -0,0 +1,402 @@
+"""
+Precomputed catalog snapshots for app cold starts.
+
+The ``hourly_long`` job materializes the item catalog into gzip compressed
+JSON files under ``public/files/catalog``, one set per
+``channelCatSubCat.channelid`` and language, which the web server hands out
+without reaching a Python worker. Each set has a base file holding every
+item of the channel and delta files holding what changed between two
+versions. A new base is written every ``jawad_catalog_base_hours`` or after
+``jawad_catalog_max_deltas`` deltas; in between, runs that find changes
+write only deltas.
+
+``manifest.json`` lists the current base and deltas of every set. Clients
+download the base once, then the deltas after the version they hold, and
+apply them in order: upsert ``items`` by ``id`` and drop ``deleted`` ids.
+A file that leaves the manifest is retired, and removed
+``jawad_catalog_retention_hours`` after that, so clients mid-download can
+finish.
+
+Build the snapshots by hand with::
+
+    bench --site <site> execute jawad.jawad.catalog.build_snapshots
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+
+import frappe
+from frappe.utils import now, time_diff_in_seconds
+
+from jawad.jawad.aiwago import attach_item_children
+from jawad.jawad.pagination import iter_batches
+from jawad.jawad.response import encode
+
+CATALOG_FOLDER = "catalog"
+MANIFEST_FILE = "manifest.json"
+STATE_FILE = "catalog_state.json.gz"
+MANIFEST_CACHE_KEY = "jawad:catalog:manifest"
+
+BASE_HOURS = 24
+MAX_DELTAS = 48
+RETENTION_HOURS = 24
+
+# language -> (name column, description column)
+LANGUAGES = {
+    "en": ("item_name", "description"),
+    "ar": ("custom_name_arabic", "custom_descriptionar"),
+    "hi": ("custom_namehi", "custom_descriptionhi"),
+    "ur": ("custom_nameur", "custom_descriptionur"),
+}
+
+
+def build_snapshots(force_base=False):
+    """
+    Scheduled job: write base or delta files for every channel and language
+    whose items changed since the last run, then the manifest. Returns the
+    new catalog version, or the current one when nothing changed.
+
+    Items are read a batch at a time and written straight to their files,
+    so memory holds one digest per item and channel, not the catalog.
+    """
+    state = _read_state()
+    previous = state.get("digests", {})
+    manifest = read_manifest() or {"version": 0, "channels": {}}
+    published = _referenced_urls(manifest)
+    version = manifest["version"] + 1
+    base_due = force_base or _base_due(manifest)
+
+    digests = {}
+    files = {}
+    try:
+        for channel, item_id, records in _iter_items():
+            digest = _digest(records)
+            item_changed = previous.get(channel, {}).get(item_id) != digest
+            digests.setdefault(channel, {})[item_id] = digest
+            for language, record in records.items():
+                if (channel, language) not in files:
+                    files[channel, language] = _open_set(
+                        manifest, channel, language, version, base_due
+                    )
+                snapshot_file = files[channel, language]
+                if snapshot_file.is_base or item_changed:
+                    snapshot_file.add(record)
+
+        # a channel without items left gets an empty base, so clients clear it
+        for channel, languages in manifest["channels"].items():
+            if channel not in digests and previous.get(channel):
+                for language in languages:
+                    files[channel, language] = _open_set(
+                        manifest, channel, language, version, True
+                    )
+
+        changed = False
+        for (channel, language), snapshot_file in files.items():
+            languages = manifest["channels"].setdefault(channel, {})
+            if snapshot_file.is_base:
+                languages[language] = {
+                    "version": version,
+                    "base": {
+                        "version": version,
+                        "items": snapshot_file.count,
+                        **snapshot_file.close(),
+                    },
+                    "deltas": [],
+                }
+                changed = True
+                continue
+
+            current = digests.get(channel, {})
+            deleted = [i for i in previous.get(channel, {}) if i not in current]
+            if snapshot_file.count or deleted:
+                entry = languages[language]
+                entry["deltas"].append(
+                    {
+                        "from": entry["version"],
+                        "to": version,
+                        **snapshot_file.close(deleted=deleted),
+                    }
+                )
+                entry["version"] = version
+                changed = True
+    finally:
+        for snapshot_file in files.values():
+            snapshot_file.abort()
+
+    if changed:
+        manifest["version"] = version
+        manifest["generated_at"] = now()
+        if base_due:
+            manifest["base_generated_at"] = manifest["generated_at"]
+        _write_json(_public_path(MANIFEST_FILE), manifest)
+        frappe.cache().delete_value(MANIFEST_CACHE_KEY)
+    else:
+        digests = previous
+
+    retired = state.get("retired", {})
+    retired_at = time.time()
+    for url in published - _referenced_urls(manifest):
+        retired.setdefault(url, retired_at)
+    purge_snapshots(manifest, retired)
+    _write_state({"digests": digests, "retired": retired})
+    return manifest["version"]
+
+
+def read_manifest():
+    """Return the current manifest, or ``None`` before the first build."""
+    manifest = frappe.cache().get_value(MANIFEST_CACHE_KEY)
+    if manifest is not None:
+        return manifest
+
+    path = _public_path(MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        manifest = json.loads(f.read())
+    frappe.cache().set_value(MANIFEST_CACHE_KEY, manifest, expires_in_sec=300)
+    return manifest
+
+
+def purge_snapshots(manifest, retired):
+    """
+    Delete snapshot files retired longer ago than the retention window.
+    ``retired`` maps a file url to the time it left the manifest and is
+    updated in place. A file found outside the manifest with no retirement
+    time, such as one left by a failed build, is retired now.
+    """
+    referenced = _referenced_urls(manifest)
+    hours = frappe.conf.get("jawad_catalog_retention_hours")
+    cutoff = time.time() - 3600 * (RETENTION_HOURS if hours is None else hours)
+
+    found = set()
+    root = _public_path()
+    for folder, _dirs, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(folder, filename)
+            url = _url(path)
+            if folder == root or url in referenced:
+                continue
+            if retired.setdefault(url, time.time()) < cutoff:
+                os.remove(path)
+                continue
+            found.add(url)
+
+    # forget files that are gone, along with any that came back into use
+    for url in list(retired):
+        if url not in found:
+            del retired[url]
+
+
+def _referenced_urls(manifest):
+    urls = set()
+    for languages in manifest["channels"].values():
+        for entry in languages.values():
+            urls.add(entry["base"]["url"])
+            urls.update(delta["url"] for delta in entry["deltas"])
+    return urls
+
+
+def _iter_items():
+    """
+    Yield ``(channel, item id, {language: item})`` for every item of every
+    channel, reading the Item table a batch at a time.
+    """
+    item = frappe.qb.DocType("Item")
+    columns = {
+        column
+        for name_column, description_column in LANGUAGES.values()
+        for column in (name_column, description_column)
+    }
+
+    def build_query():
+        return frappe.qb.from_(item).select(
+            item.name.as_("id"),
+            item.item_code,
+            item.custom_brand_id.as_("brand"),
+            *(item.field(column) for column in sorted(columns)),
+        )
+
+    for batch in iter_batches(build_query, item.name):
+        for row in attach_item_children(batch):
+            categories_by_channel = {}
+            for link in row["channelCatSubCat"]:
+                if link.channelid:
+                    categories_by_channel.setdefault(link.channelid, []).append(
+                        {
+                            "categoryid": link.categoryid,
+                            "subcategoryid": link.subcategoryid,
+                        }
+                    )
+
+            for channel, categories in categories_by_channel.items():
+                yield channel, row["id"], {
+                    language: {
+                        "id": row["id"],
+                        "item_code": row["item_code"],
+                        "name": row[name_column] or row["item_name"],
+                        "description": row[description_column] or row["description"],
+                        "brand": row["brand"],
+                        "categories": categories,
+                        "images": row["subcatimg"],
+                    }
+                    for language, (name_column, description_column) in LANGUAGES.items()
+                }
+
+
+def _open_set(manifest, channel, language, version, base_due):
+    """Return the base or delta file this run writes for one set."""
+    entry = manifest["channels"].get(channel, {}).get(language)
+    if entry is None or base_due or len(entry["deltas"]) >= _max_deltas():
+        return _SnapshotFile(
+            _set_path(channel, language, f"base-{version}.json.gz"),
+            {"channel": channel, "language": language, "version": version},
+            is_base=True,
+        )
+
+    from_version = entry["version"]
+    return _SnapshotFile(
+        _set_path(channel, language, f"delta-{from_version}-{version}.json.gz"),
+        {
+            "channel": channel,
+            "language": language,
+            "from": from_version,
+            "to": version,
+        },
+    )
+
+
+class _SnapshotFile:
+    """
+    A gzip compressed ``{**header, "items": [...]}`` file written an item at
+    a time. Nothing touches the disk until the first item, so a delta with
+    no changes leaves no file.
+    """
+
+    def __init__(self, path, header, is_base=False):
+        self.path = path
+        self.header = header
+        self.is_base = is_base
+        self.count = 0
+        self._file = None
+        self._gzip = None
+
+    def add(self, item):
+        if self._gzip is None:
+            self._open()
+        if self.count:
+            self._gzip.write(b",")
+        self._gzip.write(encode(item))
+        self.count += 1
+
+    def close(self, **trailer):
+        """Finish the file with the ``trailer`` keys and move it into place."""
+        if self._gzip is None:
+            self._open()
+        self._gzip.write(b"]")
+        for key, value in trailer.items():
+            self._gzip.write(b"," + encode(key) + b":" + encode(value))
+        self._gzip.write(b"}")
+        self._gzip.close()
+        self._file.close()
+        self._gzip = None
+        # readers never see a half written file
+        os.replace(self._temp_path, self.path)
+        return {
+            "url": _url(self.path),
+            "size": os.path.getsize(self.path),
+            "sha256": _sha256(self.path),
+        }
+
+    def abort(self):
+        """Drop the file if :meth:`close` was not reached."""
+        if self._gzip is None:
+            return
+        self._gzip.close()
+        self._file.close()
+        self._gzip = None
+        os.remove(self._temp_path)
+
+    @property
+    def _temp_path(self):
+        return f"{self.path}.tmp"
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self._temp_path, "wb")
+        # mtime=0 keeps the bytes, and so the checksum, stable for the same data
+        self._gzip = gzip.GzipFile(
+            fileobj=self._file, mode="wb", compresslevel=9, mtime=0
+        )
+        # the header without its closing brace, then the items list
+        self._gzip.write(encode(self.header)[:-1] + b',"items":[')
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _digest(records):
+    return hashlib.sha1(encode(records)).hexdigest()
+
+
+def _base_due(manifest):
+    hours = frappe.conf.get("jawad_catalog_base_hours")
+    hours = BASE_HOURS if hours is None else hours
+    generated_at = manifest.get("base_generated_at")
+    if not generated_at:
+        return True
+    age = time_diff_in_seconds(now(), generated_at)
+    return age >= hours * 3600
+
+
+def _max_deltas():
+    return frappe.conf.get("jawad_catalog_max_deltas") or MAX_DELTAS
+
+
+def _write_json(path, data):
+    _write_file(path, encode(data))
+
+
+def _write_file(path, body):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # readers never see a half written file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(body)
+    os.replace(temp_path, path)
+
+
+def _read_state():
+    path = frappe.get_site_path("private", CATALOG_FOLDER, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with gzip.open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def _write_state(state):
+    path = frappe.get_site_path("private", CATALOG_FOLDER, STATE_FILE)
+    _write_file(path, gzip.compress(encode(state), mtime=0))
+
+
+def _set_path(channel, language, filename):
+    # channel ids are free text; a hash keeps them out of the path and
+    # apart from each other. The manifest maps the real id to the files.
+    slug = hashlib.sha1(channel.encode("utf-8")).hexdigest()[:16]
+    return _public_path(slug, language, filename)
+
+
+def _public_path(*parts):
+    return frappe.get_site_path("public", "files", CATALOG_FOLDER, *parts)
+
+
+def _url(path):
+    relative = os.path.relpath(path, frappe.get_site_path("public"))
+    return "/" + relative.replace(os.sep, "/")
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, erp and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ItemSearchIndex(Document):
+	pass
+
+
+def on_doctype_update():
+	# searches seek a term prefix within a rank; item saves replace by item
+	frappe.db.add_index("Item Search Index", ["match_rank", "term", "item"])
+	frappe.db.add_index("Item Search Index", ["item"])
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, erp and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LoginAuditLog(Document):
+	pass
+
+
+def on_doctype_update():
+	# retention purges by creation, investigations filter by user
+	frappe.db.add_index("Login Audit Log", ["creation"])
+	frappe.db.add_index("Login Audit Log", ["username", "creation"])
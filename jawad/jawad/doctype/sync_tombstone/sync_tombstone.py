@@ -0,0 +1,15 @@
+# Copyright (c) 2026, erp and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class SyncTombstone(Document):
+	pass
+
+
+def on_doctype_update():
+	# keyset reads walk (creation, name); re-created documents clear by reference
+	frappe.db.add_index("Sync Tombstone", ["creation", "name"])
+	frappe.db.add_index("Sync Tombstone", ["reference_doctype", "reference_name"])
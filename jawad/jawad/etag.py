@@ -0,0 +1,104 @@
+"""
+ETag / If-None-Match support for the read endpoints.
+
+The ETag is derived from ``MAX(modified)`` and ``COUNT(*)`` of the doctypes
+an endpoint reads plus the call arguments, which one small query answers
+without building or hashing the payload. Any insert or update moves
+``modified`` and any delete moves the count, so a matching tag means the
+body would come out the same and a ``304 Not Modified`` is sent instead.
+Endpoints that return a slice of a table pass ``filters``, so that only the
+rows they can return are fingerprinted. Compressed bodies are tagged with an
+encoding suffix by :func:`jawad.jawad.response.compress_response`, and
+either form matches.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+
+import frappe
+from werkzeug.wrappers import Response
+
+from jawad.jawad.response import ENCODINGS
+
+
+def conditional(doctypes, max_age=0, filters=None):
+    """
+    Answer ``If-None-Match`` with 304 when none of ``doctypes`` changed, and
+    tag successful responses with an ETag and a ``Cache-Control`` header.
+
+    ``filters`` maps a doctype to ``{column: argument name}``, limiting its
+    fingerprint to the rows whose column equals that argument of the call,
+    e.g. ``{"Sales Order": {"customer": "customer_id"}}``.
+    """
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            arguments = signature.bind_partial(*args, **kwargs).arguments
+            conditions = {
+                doctype: {
+                    column: arguments.get(argument)
+                    for column, argument in columns.items()
+                }
+                for doctype, columns in (filters or {}).items()
+            }
+            etag = get_etag(fn.__name__, doctypes, args, kwargs, conditions)
+            cache_control = get_cache_control(max_age)
+
+            request = getattr(frappe, "request", None)
+            matched = request and get_matching_etag(request.if_none_match, etag)
+            if matched:
+                return Response(
+                    status=304,
+                    headers={"ETag": f'"{matched}"', "Cache-Control": cache_control},
+                )
+
+            response = fn(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                response.set_etag(etag)
+                response.headers["Cache-Control"] = cache_control
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def get_etag(endpoint, doctypes, args, kwargs, filters=None):
+    """
+    Hash the call with the ``MAX(modified)`` and ``COUNT(*)`` of every
+    doctype, over the rows matching its ``{column: value}`` in ``filters``.
+    """
+    filters = filters or {}
+    queries, values = [], []
+    for doctype in doctypes:
+        query = f"SELECT MAX(`modified`), COUNT(*) FROM `tab{doctype}`"
+        conditions = filters.get(doctype)
+        if conditions:
+            query += " WHERE " + " AND ".join(f"`{c}` = %s" for c in conditions)
+            values.extend(conditions.values())
+        queries.append(query)
+    fingerprint = frappe.db.sql(" UNION ALL ".join(queries), tuple(values))
+    raw = json.dumps([endpoint, args, kwargs, fingerprint], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_matching_etag(if_none_match, etag):
+    """
+    Return the tag of ``etag`` the client holds, which carries an encoding
+    suffix when the body was sent compressed, or ``None``.
+    """
+    for candidate in (etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)):
+        if if_none_match.contains_weak(candidate):
+            return candidate
+    return None
+
+
+def get_cache_control(max_age):
+    if not max_age:
+        return "private, no-cache"
+    return f"private, max-age={max_age}, must-revalidate"
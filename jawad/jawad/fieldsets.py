@@ -0,0 +1,48 @@
+"""
+Sparse fieldsets for the list endpoints.
+
+Clients pass ``fields=id,name`` to receive only those keys of every row.
+Each endpoint declares the fields it can return, mapped to the column or
+child query that produces them. Requested fields are checked against that
+whitelist, and the endpoint selects only the columns behind them and skips
+child-table queries nobody asked for. The row id is always returned.
+"""
+
+import frappe
+
+
+class InvalidFieldsRequest(frappe.ValidationError):
+    pass
+
+
+def parse_fields(fields, allowed, required=("id",)):
+    """
+    Return the requested field names, in the order of ``allowed``, or all of
+    ``allowed`` when ``fields`` is empty. ``fields`` is a comma separated
+    string or a list. The ``required`` fields are always included.
+    """
+    if not fields:
+        return list(allowed)
+    if isinstance(fields, str):
+        fields = fields.split(",")
+
+    requested = {field.strip() for field in fields if field and field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise InvalidFieldsRequest(
+            f"Unknown fields: {', '.join(sorted(unknown))}. "
+            f"Allowed fields: {', '.join(allowed)}"
+        )
+
+    requested.update(required)
+    return [field for field in allowed if field in requested]
+
+
+def select_fields(query, columns, fields):
+    """
+    Add the columns of ``fields`` to a ``frappe.qb`` query. ``columns`` maps
+    a field name to its query term; fields without one, such as child lists,
+    are left to the caller.
+    """
+    terms = [columns[field].as_(field) for field in fields if field in columns]
+    return query.select(*terms)
@@ -0,0 +1,187 @@
+"""
+``Idempotency-Key`` support for the mutating endpoints.
+
+The mobile app sends a fresh key with every logical request and repeats it
+when it retries after a network error. The first response for a key is
+kept in Redis, scoped to the endpoint and the session user, or the client
+IP for guests, and replayed for every repeat without running the endpoint
+again. A repeat that arrives while
+the first request is still running waits for its response instead of racing
+it into a second insert.
+
+Requests without the header behave exactly as before.
+"""
+
+import functools
+import hashlib
+import time
+
+import frappe
+from werkzeug.wrappers import Response
+
+from jawad.jawad.response import error_response
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+DEFAULT_TTL = 24 * 60 * 60
+LOCK_TTL = 5 * 60
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.1
+
+SKIPPED_HEADERS = ("content-length", "set-cookie")
+
+
+def idempotent(ttl=None):
+    """
+    Replay the stored response of a whitelisted endpoint when the request
+    repeats an ``Idempotency-Key`` already seen for the same user.
+
+    Only non-5xx ``Response`` objects are stored. Server errors and raised
+    exceptions release the key so the client can retry.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            request = getattr(frappe, "request", None)
+            idempotency_key = request and request.headers.get(IDEMPOTENCY_HEADER)
+            if not idempotency_key:
+                return fn(*args, **kwargs)
+
+            if len(idempotency_key) > MAX_KEY_LENGTH:
+                return _error(
+                    f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters",
+                    400,
+                )
+
+            key = _entry_key(f"{fn.__module__}.{fn.__name__}", idempotency_key)
+            fingerprint = _fingerprint(request)
+
+            entry = _get_entry(key)
+            if entry:
+                return _replay(entry, fingerprint)
+
+            lock = frappe.generate_hash(length=20)
+            if not _acquire(key, lock):
+                # another worker is running the first request for this key
+                entry = _wait_for_entry(key)
+                if entry:
+                    return _replay(entry, fingerprint)
+                if not _acquire(key, lock):
+                    return _error(
+                        "A request with this Idempotency-Key is still in progress",
+                        409,
+                    )
+
+            try:
+                entry = _get_entry(key)
+                if entry:
+                    return _replay(entry, fingerprint)
+
+                response = fn(*args, **kwargs)
+                if isinstance(response, Response) and response.status_code < 500:
+                    # the stored response must never refer to documents that
+                    # are rolled back afterwards
+                    frappe.db.commit()
+                    _store(key, response, fingerprint, ttl)
+                return response
+            finally:
+                _release(key, lock)
+
+        return wrapper
+
+    return decorator
+
+
+def _entry_key(endpoint, idempotency_key):
+    digest = hashlib.sha1(
+        f"{endpoint}:{_client_scope()}:{idempotency_key}".encode("utf-8")
+    ).hexdigest()
+    return f"jawad:idempotency:{digest}"
+
+
+def _client_scope():
+    user = frappe.session.user
+    if user != "Guest":
+        return user
+    # every anonymous caller is "Guest", so keys must not be shared between
+    # them: one guest could otherwise replay another's response
+    return f"Guest:{frappe.local.request_ip}"
+
+
+def _lock_key(key):
+    return frappe.cache().make_key(f"{key}:lock")
+
+
+def _fingerprint(request):
+    payload = request.query_string + b"\n" + request.get_data()
+    return hashlib.sha1(payload).hexdigest()
+
+
+def _acquire(key, lock):
+    return bool(frappe.cache().set(_lock_key(key), lock, nx=True, ex=LOCK_TTL))
+
+
+def _release(key, lock):
+    cache = frappe.cache()
+    owner = cache.get(_lock_key(key))
+    if owner and owner.decode() == lock:
+        cache.delete(_lock_key(key))
+
+
+def _get_entry(key):
+    # ``expires`` keeps the per-request local cache out of the way, which
+    # would otherwise keep answering the first miss while polling
+    return frappe.cache().get_value(key, expires=True)
+
+
+def _wait_for_entry(key):
+    """
+    Poll for the entry of ``key`` until it appears, the in-flight request
+    gives up its lock, or the wait times out.
+    """
+    cache = frappe.cache()
+    deadline = time.monotonic() + (
+        frappe.conf.get("jawad_idempotency_wait") or WAIT_TIMEOUT
+    )
+    while True:
+        entry = _get_entry(key)
+        if entry:
+            return entry
+        if not cache.get(_lock_key(key)) or time.monotonic() >= deadline:
+            return _get_entry(key)
+        time.sleep(POLL_INTERVAL)
+
+
+def _store(key, response, fingerprint, ttl):
+    frappe.cache().set_value(
+        key,
+        {
+            "fingerprint": fingerprint,
+            "body": response.get_data(),
+            "status": response.status_code,
+            "headers": [
+                (header, value)
+                for header, value in response.headers.items()
+                if header.lower() not in SKIPPED_HEADERS
+            ],
+        },
+        expires_in_sec=ttl or frappe.conf.get("jawad_idempotency_ttl") or DEFAULT_TTL,
+    )
+
+
+def _replay(entry, fingerprint):
+    if entry["fingerprint"] != fingerprint:
+        return _error(
+            f"{IDEMPOTENCY_HEADER} was already used for a different request", 422
+        )
+
+    response = Response(entry["body"], status=entry["status"], headers=entry["headers"])
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _error(message, status):
+    return error_response(message, status)
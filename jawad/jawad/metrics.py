@@ -0,0 +1,224 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+:func:`instrument` times every call of a whitelisted endpoint and counts the
+SQL statements it runs. Observations are bucketed into histograms in worker
+memory and added to one Redis hash per site every few seconds, so a request
+pays for a few dictionary updates rather than a Redis round trip. The
+``metrics`` endpoint sums the hash across all workers.
+"""
+
+import functools
+import threading
+import time
+from collections import defaultdict
+
+import frappe
+from werkzeug.wrappers import Response
+
+METRICS_KEY = "jawad:metrics"
+FLUSH_INTERVAL = 10
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# metric -> (buckets, help text)
+HISTOGRAMS = {
+    "jawad_request_duration_seconds": (
+        DURATION_BUCKETS,
+        "Wall time spent in the endpoint.",
+    ),
+    "jawad_db_duration_seconds": (
+        DURATION_BUCKETS,
+        "Time spent waiting on SQL statements.",
+    ),
+    "jawad_db_queries": (QUERY_BUCKETS, "SQL statements run per request."),
+    "jawad_serialization_duration_seconds": (
+        DURATION_BUCKETS,
+        "Time spent encoding JSON response bodies.",
+    ),
+    "jawad_response_bytes": (SIZE_BUCKETS, "Size of buffered response bodies."),
+}
+REQUESTS_TOTAL = "jawad_requests_total"
+
+# site -> {hash field: increment}, flushed to Redis by the worker that owns it
+_pending = defaultdict(lambda: defaultdict(float))
+_pending_lock = threading.Lock()
+_last_flush = {}
+
+
+def instrument():
+    """
+    Record wall time, DB time, SQL statement count, serialization time,
+    response size and status code of every call of an endpoint.
+    """
+
+    def decorator(fn):
+        endpoint = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(frappe.local, "jawad_metrics", None) is not None:
+                # called from another instrumented endpoint
+                return fn(*args, **kwargs)
+
+            stats = frappe.local.jawad_metrics = {
+                "queries": 0,
+                "db_time": 0.0,
+                "serialization_time": 0.0,
+            }
+            db = frappe.db
+            sql = db.sql
+            # keep any wrapper already set on the connection, such as a test's
+            overridden = "sql" in db.__dict__
+
+            def timed_sql(*sql_args, **sql_kwargs):
+                start = time.perf_counter()
+                try:
+                    return sql(*sql_args, **sql_kwargs)
+                finally:
+                    stats["queries"] += 1
+                    stats["db_time"] += time.perf_counter() - start
+
+            db.sql = timed_sql
+            start = time.perf_counter()
+            status = 500
+            response = None
+            try:
+                response = fn(*args, **kwargs)
+                status = _get_status(response)
+                return response
+            except Exception as e:
+                status = getattr(e, "http_status_code", 500)
+                raise
+            finally:
+                wall_time = time.perf_counter() - start
+                if overridden:
+                    db.sql = sql
+                else:
+                    del db.sql
+                frappe.local.jawad_metrics = None
+                _record(endpoint, status, wall_time, stats, _get_size(response))
+
+        return wrapper
+
+    return decorator
+
+
+def add_serialization_time(seconds):
+    """Count ``seconds`` of JSON encoding towards the running endpoint."""
+    stats = getattr(frappe.local, "jawad_metrics", None)
+    if stats is not None:
+        stats["serialization_time"] += seconds
+
+
+def export():
+    """Return every site metric in the Prometheus text exposition format."""
+    _flush(force=True)
+    cache = frappe.cache()
+    raw = cache.pipeline().hgetall(cache.make_key(METRICS_KEY)).execute()[0]
+    values = {field.decode(): float(value) for field, value in raw.items()}
+
+    lines = []
+    for metric, (buckets, help_text) in HISTOGRAMS.items():
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for endpoint in _endpoints(values, metric):
+            prefix = f"{metric}|{endpoint}|"
+            cumulative = 0
+            for bound in (*buckets, "+Inf"):
+                cumulative += values.get(f"{prefix}{bound}", 0)
+                lines.append(
+                    f'{metric}_bucket{{endpoint="{endpoint}",le="{bound}"}} '
+                    f"{_format(cumulative)}"
+                )
+            lines.append(
+                f'{metric}_sum{{endpoint="{endpoint}"}} '
+                f"{_format(values.get(prefix + 'sum', 0))}"
+            )
+            lines.append(
+                f'{metric}_count{{endpoint="{endpoint}"}} '
+                f"{_format(values.get(prefix + 'count', 0))}"
+            )
+
+    lines.append(f"# HELP {REQUESTS_TOTAL} Requests served, by status code.")
+    lines.append(f"# TYPE {REQUESTS_TOTAL} counter")
+    for field, value in sorted(values.items()):
+        metric, endpoint, status = field.split("|")
+        if metric == REQUESTS_TOTAL:
+            lines.append(
+                f'{metric}{{endpoint="{endpoint}",status="{status}"}} {_format(value)}'
+            )
+
+    return "\n".join(lines) + "\n"
+
+
+def _get_status(response):
+    if isinstance(response, Response):
+        return response.status_code
+    return frappe.local.response.get("http_status_code") or 200
+
+
+def _get_size(response):
+    if isinstance(response, Response) and not response.is_streamed:
+        return len(response.get_data())
+    return None
+
+
+def _record(endpoint, status, wall_time, stats, size):
+    observations = [
+        ("jawad_request_duration_seconds", wall_time),
+        ("jawad_db_duration_seconds", stats["db_time"]),
+        ("jawad_db_queries", stats["queries"]),
+        ("jawad_serialization_duration_seconds", stats["serialization_time"]),
+    ]
+    if size is not None:
+        observations.append(("jawad_response_bytes", size))
+
+    with _pending_lock:
+        pending = _pending[frappe.local.site]
+        for metric, value in observations:
+            prefix = f"{metric}|{endpoint}|"
+            pending[prefix + _bucket(HISTOGRAMS[metric][0], value)] += 1
+            pending[prefix + "sum"] += value
+            pending[prefix + "count"] += 1
+        pending[f"{REQUESTS_TOTAL}|{endpoint}|{status}"] += 1
+
+    _flush()
+
+
+def _flush(force=False):
+    site = frappe.local.site
+    now = time.monotonic()
+    with _pending_lock:
+        if not force and now - _last_flush.get(site, 0) < FLUSH_INTERVAL:
+            return
+        _last_flush[site] = now
+        pending = _pending.pop(site, None)
+
+    if not pending:
+        return
+    cache = frappe.cache()
+    key = cache.make_key(METRICS_KEY)
+    pipeline = cache.pipeline(transaction=False)
+    for field, value in pending.items():
+        pipeline.hincrbyfloat(key, field, value)
+    pipeline.execute()
+
+
+def _bucket(buckets, value):
+    for bound in buckets:
+        if value <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def _endpoints(values, metric):
+    return sorted(
+        {field.split("|")[1] for field in values if field.startswith(metric + "|")}
+    )
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(value)
@@ -0,0 +1,140 @@
+"""
+OAuth helpers for the login endpoints: cached OAuth Client lookups and
+in-process access to Frappe's token endpoint.
+
+The login endpoints used to POST back to our own ``host_name`` at
+``frappe.integrations.oauth2.get_token``, which held a second worker and a
+full HTTP round trip for every login. The same ``oauthlib`` server object
+that endpoint uses is driven here directly instead, inside the current
+request.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+import frappe
+from frappe.oauth import get_oauth_server
+from frappe.utils import get_url
+from oauthlib.oauth2 import FatalClientError, OAuth2Error
+
+TOKEN_PATH = "/api/method/frappe.integrations.oauth2.get_token"
+
+CLIENT_CACHE_PREFIX = "jawad:oauth_client:"
+CLIENT_CACHE_TTL = 60 * 60
+UNKNOWN_CLIENT_TTL = 5 * 60
+LOCAL_CLIENT_TTL = 30
+LOCAL_CLIENT_SIZE = 256
+UNKNOWN_CLIENT = (None, None, None)
+
+# (site, app name) -> (expires at, client), shared by the threads of a worker
+_local_clients = OrderedDict()
+_local_clients_lock = threading.Lock()
+
+
+def get_oauth_client(app_name):
+    """
+    Return ``(client_id, client_secret, user)`` of the OAuth Client named
+    ``app_name``, or ``(None, None, None)`` when there is none.
+
+    Lookups go through a small per-process LRU, then Redis, then the
+    database. Unknown names are cached as well, so that garbage app keys
+    cannot reach the database on every request. Saving or deleting an
+    OAuth Client clears Redis at once. Other workers' LRUs pick up the
+    change within ``LOCAL_CLIENT_TTL`` seconds.
+    """
+    local_key = (frappe.local.site, app_name)
+    now = time.monotonic()
+    with _local_clients_lock:
+        entry = _local_clients.get(local_key)
+        if entry and entry[0] > now:
+            _local_clients.move_to_end(local_key)
+            return entry[1]
+
+    cache = frappe.cache()
+    key = CLIENT_CACHE_PREFIX + app_name
+    client = cache.get_value(key)
+    if client is None:
+        client = (
+            frappe.db.get_value(
+                "OAuth Client",
+                {"app_name": app_name},
+                ["client_id", "client_secret", "user"],
+            )
+            or UNKNOWN_CLIENT
+        )
+        client = tuple(client)
+        cache.set_value(
+            key,
+            client,
+            expires_in_sec=(
+                UNKNOWN_CLIENT_TTL if client == UNKNOWN_CLIENT else CLIENT_CACHE_TTL
+            ),
+        )
+
+    with _local_clients_lock:
+        _local_clients[local_key] = (now + LOCAL_CLIENT_TTL, client)
+        _local_clients.move_to_end(local_key)
+        while len(_local_clients) > LOCAL_CLIENT_SIZE:
+            _local_clients.popitem(last=False)
+    return client
+
+
+def invalidate_oauth_clients(doc=None, method=None, *args, **kwargs):
+    """``doc_events`` hook: forget every cached OAuth Client lookup."""
+    _clear_oauth_clients()
+    # a concurrent lookup may cache the old row before this transaction
+    # commits, so clear once more when it does
+    frappe.db.after_commit.add(_clear_oauth_clients)
+
+
+def _clear_oauth_clients():
+    # unknown names are cached too, and a new client may take one of them,
+    # so every entry goes rather than only this document's
+    frappe.cache().delete_keys(CLIENT_CACHE_PREFIX)
+    with _local_clients_lock:
+        _local_clients.clear()
+
+
+def create_token(body):
+    """
+    Run a token request ``body`` (the form fields a client would POST to
+    ``get_token``) through Frappe's OAuth server.
+
+    Returns ``(status, payload)``, where ``payload`` is the JSON that
+    ``get_token`` would have answered with.
+    """
+    headers = {
+        "Content-Type": "application/x-www-form-urlencoded",
+        # Frappe's validator only accepts the client when this cookie names
+        # the session user, which an anonymous loopback request always did
+        "Cookie": f"user_id={quote(frappe.session.user)}",
+    }
+
+    # validating a password grant resumes a session through LoginManager,
+    # which must not replace the one this request is served under
+    session = frappe.local.session
+    session_obj = getattr(frappe.local, "session_obj", None)
+    try:
+        _headers, response_body, status = get_oauth_server().create_token_response(
+            get_url(TOKEN_PATH), "POST", body, headers, None
+        )
+    except (FatalClientError, OAuth2Error) as e:
+        return e.status_code, {
+            "description": e.description,
+            "status_code": e.status_code,
+            "error": e.error,
+        }
+    except frappe.AuthenticationError as e:
+        frappe.clear_messages()
+        return 401, {"exc_type": "AuthenticationError", "exception": str(e)}
+    finally:
+        frappe.local.session = session
+        frappe.local.session_obj = session_obj
+
+    payload = json.loads(response_body)
+    if payload.get("error"):
+        return 400, payload
+    return status, payload
@@ -0,0 +1,503 @@
+"""
+Sales Order creation shared by the order endpoints.
+
+Every item on an order is resolved up front with a handful of ``IN``
+queries (item master, UOM conversions and item defaults), and the Sales
+Order Item rows are pre-filled from that data. Large orders then no longer
+pay a round trip per line before validation starts. Bulk ingestion resolves
+the items of all its orders in one go.
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import cstr, flt, nowdate
+from frappe.utils.background_jobs import get_queues_timeout
+
+BULK_ORDER_LIMIT = 500
+BULK_ORDER_BATCH_SIZE = 50
+
+ORDER_QUEUE = "jawad_orders"
+ORDER_JOB_ATTEMPTS = 3
+ORDER_JOB_RETRY_DELAY = 60
+ORDER_JOB_MAX_RETRY_DELAY = 15 * 60
+ORDER_JOB_TTL = 24 * 60 * 60
+DEAD_LETTER_KEY = "jawad:orders:dead_letter"
+RETRY_KEY = "jawad:orders:retries"
+DEAD_LETTER_SIZE = 1000
+
+
+class InvalidOrder(frappe.ValidationError):
+    pass
+
+
+def prefetch_items(item_codes, company=None):
+    """
+    Return ``{item_code: item}`` for the existing items among ``item_codes``,
+    each carrying its stock UOM, stock-item flag, UOM conversion factors and
+    default warehouse for ``company``. Codes are matched as strings, so the
+    integer ``product_id`` that ``product_list`` hands out finds its item.
+    """
+    item_codes = list({cstr(code) for code in item_codes if code})
+    if not item_codes:
+        return {}
+
+    items = {
+        item.name: item
+        for item in frappe.get_all(
+            "Item",
+            fields=["name", "item_name", "stock_uom", "is_stock_item"],
+            filters={"name": ["in", item_codes]},
+        )
+    }
+    if not items:
+        return items
+
+    for item in items.values():
+        item.conversion_factors = {item.stock_uom: 1.0}
+        item.default_warehouse = None
+
+    for row in frappe.get_all(
+        "UOM Conversion Detail",
+        fields=["parent", "uom", "conversion_factor"],
+        filters={"parent": ["in", list(items)], "parenttype": "Item"},
+    ):
+        items[row.parent].conversion_factors[row.uom] = flt(row.conversion_factor)
+
+    company = company or frappe.db.get_single_value(
+        "Global Defaults", "default_company"
+    )
+    if company:
+        for row in frappe.get_all(
+            "Item Default",
+            fields=["parent", "default_warehouse"],
+            filters={
+                "parent": ["in", list(items)],
+                "parenttype": "Item",
+                "company": company,
+            },
+        ):
+            items[row.parent].default_warehouse = row.default_warehouse
+
+    return items
+
+
+def build_order_items(lines, code_field, fallback_warehouse, company=None, items=None):
+    """
+    Turn the order lines posted by the app into Sales Order Item rows.
+
+    Returns ``(rows, unknown_codes)``; lines whose item does not exist are
+    left out of ``rows`` and reported in ``unknown_codes``. ``items`` may
+    carry the result of :func:`prefetch_items` for a batch of orders.
+    """
+    if items is None:
+        items = prefetch_items([line.get(code_field) for line in lines], company)
+
+    rows = []
+    unknown_codes = []
+    for line in lines:
+        item = items.get(cstr(line.get(code_field)))
+        if not item:
+            unknown_codes.append(line.get(code_field))
+            continue
+
+        uom = line.get("uom", "Nos")
+        row = {
+            "item_code": item.name,
+            "item_name": item.item_name,
+            "qty": line.get("quantity", 0),
+            "rate": line.get("price", 0),
+            "delivery_date": line.get("delivery_date", nowdate()),
+            "uom": uom,
+            "stock_uom": item.stock_uom,
+            "warehouse": line.get("warehouse")
+            or item.default_warehouse
+            or (fallback_warehouse if item.is_stock_item else None),
+        }
+        if uom in item.conversion_factors:
+            row["conversion_factor"] = item.conversion_factors[uom]
+        rows.append(row)
+
+    return rows, unknown_codes
+
+
+def create_post_order(customer_id, branch_id, promotion_code, total, items):
+    """Insert the Sales Order posted to ``apis.post_order`` and return its name."""
+    invoice_items, unknown_items = build_order_items(
+        items, "product_id", "All Warehouses - erp"
+    )
+    if unknown_items:
+        raise InvalidOrder(f"Unknown items: {', '.join(map(str, unknown_items))}")
+
+    order = frappe.get_doc(
+        {
+            "doctype": "Sales Order",
+            "customer": customer_id,
+            "items": invoice_items,
+            "coupon_code": promotion_code,
+            "branch_id": branch_id,
+            "total1": total,
+        }
+    )
+    order.insert(ignore_permissions=True)
+    return order.name
+
+
+def save_order(data, items=None):
+    """
+    Create the Sales Order described by an app payload, or update the one
+    named by ``order_id``. Returns ``(message, order_data)``.
+    """
+    if not data.get("user_id"):
+        raise InvalidOrder("user_id is required.")
+
+    if not data.get("items"):
+        raise InvalidOrder("items list is required.")
+
+    # items that do not exist are skipped
+    invoice_items, _unknown = build_order_items(
+        data.get("items"), "item_code", "Stores - A", items=items
+    )
+
+    if not invoice_items:
+        raise InvalidOrder("No valid items found for order.")
+
+    sales_team = []
+    if data.get("sales_man_name"):
+        sales_team.append(
+            {"sales_person": data.get("sales_man_name"), "allocated_percentage": 100}
+        )
+    existing_order = None
+    if data.get("order_id"):
+        existing_order = frappe.db.exists("Sales Order", {"name": data.get("order_id")})
+
+    if existing_order:
+
+        order = frappe.get_doc("Sales Order", existing_order)
+
+        order.discount_amount = data.get("discount_amount", order.discount_amount)
+        order.grand_total = data.get("total", order.grand_total)
+        order.coupon_code = data.get("promotion_code", order.coupon_code)
+        order.branch_id = data.get("branch_id", order.branch_id)
+        order.custom_orderby = data.get("orderby", order.custom_orderby)
+        order.address_display = data.get("address_display", order.address_display)
+        order.shipping_address = data.get("shipping_address", order.shipping_address)
+        order.custom_region = data.get("region", order.custom_region)
+        order.custom_payment_options = data.get(
+            "payment_options", order.custom_payment_options
+        )
+
+        order.set("items", [])
+        for item in invoice_items:
+            order.append("items", item)
+
+        order.set("sales_team", [])
+        for sales_person in sales_team:
+            order.append("sales_team", sales_person)
+
+        order.save(ignore_permissions=True)
+        message = "Sales Order updated successfully"
+
+    else:
+
+        order = frappe.get_doc(
+            {
+                "doctype": "Sales Order",
+                "customer": data.get("user_id"),
+                "items": invoice_items,
+                "discount_amount": data.get("discount_amount", 0),
+                "grand_total": data.get("total", 0),
+                "coupon_code": data.get("promotion_code"),
+                "custom_orderby": data.get("orderby", 1),
+                "custom_region": data.get("region", ""),
+                "address_display": data.get("address_display", ""),
+                "shipping_address": data.get("shipping_address", ""),
+                "sales_team": sales_team,
+                "custom_payment_options": data.get("payment_options", "COD"),
+            }
+        )
+
+        order.insert(ignore_permissions=True)
+        message = "Sales Order created successfully"
+
+    items_data = [
+        {
+            "item_code": i.item_code,
+            "qty": i.qty,
+            "rate": i.rate,
+            "uom": i.uom,
+            "warehouse": i.warehouse,
+        }
+        for i in order.items
+    ]
+
+    sales_team_data = [
+        {
+            "sales_person": st.sales_person,
+            "allocated_percentage": st.allocated_percentage,
+        }
+        for st in order.sales_team
+    ]
+
+    order_data = {
+        "name": order.name,
+        "customer": order.customer,
+        "grand_total": order.grand_total,
+        "total_qty": order.total_qty,
+        "discount_amount": order.discount_amount,
+        "status": order.status,
+        "items": items_data,
+        "sales_team": sales_team_data,
+        "coupon_code": order.coupon_code,
+        "orderby": order.custom_orderby,
+        "billing address": order.address_display,
+        "shipping_address": order.shipping_address,
+        "region": order.custom_region,
+        "payment_options": order.custom_payment_options,
+    }
+
+    return message, order_data
+
+
+def save_orders(orders, batch_size=BULK_ORDER_BATCH_SIZE):
+    """
+    Save ``orders`` one savepoint each, committing every ``batch_size``
+    orders. Items of all orders are resolved together up front.
+    """
+    started = time.monotonic()
+    items = prefetch_items(
+        line.get("item_code")
+        for order in orders
+        if isinstance(order, dict)
+        for line in order.get("items") or []
+        if isinstance(line, dict)
+    )
+
+    results = []
+    for index, data in enumerate(orders):
+        savepoint = f"jawad_bulk_order_{index}"
+        frappe.db.savepoint(savepoint)
+        try:
+            if not isinstance(data, dict):
+                raise InvalidOrder("order must be an object.")
+            message, order_data = save_order(data, items=items)
+        except Exception as e:
+            frappe.db.rollback(save_point=savepoint)
+            frappe.clear_messages()
+            results.append({"index": index, "status": "error", "error": str(e)})
+        else:
+            frappe.db.release_savepoint(savepoint)
+            results.append(
+                {
+                    "index": index,
+                    "status": "success",
+                    "message": message,
+                    "id": order_data["name"],
+                }
+            )
+
+        if (index + 1) % batch_size == 0:
+            frappe.db.commit()
+
+    frappe.db.commit()
+    elapsed = time.monotonic() - started
+    return {
+        "results": results,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "orders_per_second": round(len(orders) / elapsed, 1) if elapsed else None,
+    }
+
+
+def validate_order_payload(kind, payload):
+    """Cheap checks run before an order is queued; nothing here reads the DB."""
+    if kind == "post_order":
+        if not payload.get("customer_id"):
+            raise InvalidOrder("Missing required parameters: customer_id, items")
+        code_field = "product_id"
+    else:
+        if not payload.get("user_id"):
+            raise InvalidOrder("user_id is required.")
+        code_field = "item_code"
+
+    lines = payload.get("items")
+    if not lines or not isinstance(lines, list):
+        raise InvalidOrder("items list is required.")
+    if not all(isinstance(line, dict) and line.get(code_field) for line in lines):
+        raise InvalidOrder(f"every item needs a {code_field}.")
+
+
+def get_order_queue():
+    queue = frappe.conf.get("jawad_order_queue") or ORDER_QUEUE
+    # fall back while the dedicated worker is not configured on the bench
+    return queue if queue in get_queues_timeout() else "default"
+
+
+def enqueue_order(kind, payload):
+    """
+    Queue an order for background insertion and return the job id that
+    :func:`get_order_job` answers for.
+    """
+    validate_order_payload(kind, payload)
+
+    order_job_id = frappe.generate_hash(length=20)
+    _set_order_job(
+        order_job_id,
+        {"status": "queued", "attempts": 0, "user": frappe.session.user},
+    )
+    _enqueue_attempt(order_job_id, kind, payload, attempt=1)
+    return order_job_id
+
+
+def process_order_job(order_job_id, kind, payload, attempt=1):
+    """
+    Background job: insert a queued order. Transient failures are retried
+    by :func:`enqueue_due_retries` after a growing delay.
+    """
+    job = _update_order_job(order_job_id, status="running", attempts=attempt)
+    if _is_saved(job.get("saved")):
+        # the previous attempt committed the order before it failed
+        _update_order_job(
+            order_job_id, status="success", result=job["pending_result"], error=None
+        )
+        return
+
+    try:
+        if kind == "post_order":
+            name = create_post_order(**payload)
+            result = {"message": "Order created successfully", "id": name}
+        else:
+            message, order_data = save_order(payload)
+            name = order_data["name"]
+            result = {"message": message, "data": order_data}
+        # recorded before the commit, so that a retry after a commit that
+        # raised but went through finds the order instead of saving it twice
+        _update_order_job(
+            order_job_id,
+            saved={
+                "name": name,
+                "modified": str(frappe.db.get_value("Sales Order", name, "modified")),
+            },
+            pending_result=result,
+        )
+        frappe.db.commit()
+
+    except InvalidOrder as e:
+        # retrying cannot fix the payload
+        frappe.db.rollback()
+        _fail_order_job(order_job_id, kind, payload, attempt, str(e))
+
+    except Exception as e:
+        frappe.db.rollback()
+        max_attempts = frappe.conf.get("jawad_order_job_attempts") or ORDER_JOB_ATTEMPTS
+        if attempt < max_attempts:
+            retry_at = time.time() + get_retry_delay(attempt)
+            _update_order_job(
+                order_job_id, status="retrying", error=str(e), retry_at=retry_at
+            )
+            _schedule_attempt(order_job_id, kind, payload, attempt + 1, retry_at)
+        else:
+            frappe.log_error(title="Queued Order Failed")
+            _fail_order_job(order_job_id, kind, payload, attempt, str(e))
+
+    else:
+        _update_order_job(order_job_id, status="success", result=result, error=None)
+
+
+def get_retry_delay(attempt):
+    """
+    Return the seconds to wait before retrying a failed ``attempt``,
+    doubling from ``jawad_order_job_retry_delay`` up to
+    :data:`ORDER_JOB_MAX_RETRY_DELAY`.
+    """
+    delay = frappe.conf.get("jawad_order_job_retry_delay") or ORDER_JOB_RETRY_DELAY
+    return min(delay * 2 ** (attempt - 1), ORDER_JOB_MAX_RETRY_DELAY)
+
+
+def enqueue_due_retries():
+    """Scheduled job: enqueue the order retries whose delay is over."""
+    cache = frappe.cache()
+    key = cache.make_key(RETRY_KEY)
+    for entry in cache.zrangebyscore(key, 0, time.time()):
+        # only the run that removes an entry enqueues it
+        if cache.zrem(key, entry):
+            _enqueue_attempt(**json.loads(entry))
+
+
+def get_order_job(order_job_id):
+    return frappe.cache().get_value(_order_job_key(order_job_id))
+
+
+def get_dead_letters(start=0, count=100):
+    entries = frappe.cache().lrange(DEAD_LETTER_KEY, start, start + count - 1)
+    return [json.loads(frappe.safe_decode(entry)) for entry in entries]
+
+
+def _enqueue_attempt(order_job_id, kind, payload, attempt):
+    frappe.enqueue(
+        "jawad.jawad.orders.process_order_job",
+        queue=get_order_queue(),
+        order_job_id=order_job_id,
+        kind=kind,
+        payload=payload,
+        attempt=attempt,
+    )
+
+
+def _schedule_attempt(order_job_id, kind, payload, attempt, retry_at):
+    entry = json.dumps(
+        {
+            "order_job_id": order_job_id,
+            "kind": kind,
+            "payload": payload,
+            "attempt": attempt,
+        },
+        default=str,
+    )
+    cache = frappe.cache()
+    cache.zadd(cache.make_key(RETRY_KEY), {entry: retry_at})
+
+
+def _is_saved(saved):
+    """Whether the Sales Order write recorded in ``saved`` was committed."""
+    if not saved:
+        return False
+    modified = frappe.db.get_value("Sales Order", saved["name"], "modified")
+    return modified is not None and str(modified) == saved["modified"]
+
+
+def _fail_order_job(order_job_id, kind, payload, attempt, error):
+    _update_order_job(order_job_id, status="failed", error=error)
+    cache = frappe.cache()
+    cache.lpush(
+        DEAD_LETTER_KEY,
+        json.dumps(
+            {
+                "job_id": order_job_id,
+                "kind": kind,
+                "payload": payload,
+                "attempts": attempt,
+                "error": error,
+                "failed_at": str(frappe.utils.now_datetime()),
+            },
+            default=str,
+        ),
+    )
+    cache.ltrim(DEAD_LETTER_KEY, 0, DEAD_LETTER_SIZE - 1)
+
+
+def _order_job_key(order_job_id):
+    return f"jawad:order_job:{order_job_id}"
+
+
+def _set_order_job(order_job_id, status):
+    frappe.cache().set_value(
+        _order_job_key(order_job_id), status, expires_in_sec=ORDER_JOB_TTL
+    )
+
+
+def _update_order_job(order_job_id, **changes):
+    status = get_order_job(order_job_id) or {}
+    status.update(changes)
+    _set_order_job(order_job_id, status)
+    return status
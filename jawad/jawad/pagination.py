@@ -0,0 +1,161 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints.
+
+Pages are ordered by a stable ``(sort_key, name)`` tuple and the next page
+starts strictly after the last row of the previous one, so the database can
+seek straight to it through the index instead of skipping ``OFFSET`` rows.
+The cursor handed to clients is an opaque, url-safe encoding of that tuple.
+"""
+
+import base64
+import json
+
+import frappe
+from frappe.query_builder import Order
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+CURSOR_KEY = "_cursor_key"
+CURSOR_NAME = "_cursor_name"
+
+
+class InvalidPageRequest(frappe.ValidationError):
+    pass
+
+
+def get_page_size(limit=None):
+    """Return the requested page size, clamped to the site limits."""
+    default = frappe.conf.get("jawad_page_size") or DEFAULT_PAGE_SIZE
+    maximum = frappe.conf.get("jawad_max_page_size") or MAX_PAGE_SIZE
+    if limit in (None, ""):
+        return min(default, maximum)
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise InvalidPageRequest(f"Invalid limit: {limit}")
+
+    if limit < 1:
+        raise InvalidPageRequest("limit must be a positive integer")
+    return min(limit, maximum)
+
+
+def encode_token(value):
+    """Encode a JSON-serializable value as an opaque, url-safe token."""
+    raw = json.dumps(value, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token):
+    padded = token + "=" * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+
+
+def encode_cursor(values):
+    return encode_token(values)
+
+
+def decode_cursor(cursor, size):
+    try:
+        values = decode_token(cursor)
+    except Exception:
+        raise InvalidPageRequest("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidPageRequest("Invalid cursor")
+    return values
+
+
+def keyset_criterion(name_field, sort_field, values, order=Order.asc):
+    """
+    Return the criterion selecting rows strictly after the position ``values``.
+
+    ``(k, name) > (a, b)`` is written out as ``k > a OR (k = a AND name > b)``
+    because MariaDB only turns the expanded form into an index range scan.
+    """
+    if sort_field is None:
+        (name,) = values
+        return name_field < name if order == Order.desc else name_field > name
+
+    key, name = values
+    if order == Order.desc:
+        return (sort_field < key) | ((sort_field == key) & (name_field < name))
+    return (sort_field > key) | ((sort_field == key) & (name_field > name))
+
+
+def after_cursor(name_field, sort_field, cursor, order=Order.asc):
+    """Return the criterion selecting rows strictly after ``cursor``."""
+    size = 1 if sort_field is None else 2
+    return keyset_criterion(name_field, sort_field, decode_cursor(cursor, size), order)
+
+
+def paginate(
+    query, name_field, sort_field=None, order=Order.asc, limit=None, cursor=None
+):
+    """
+    Apply keyset ordering, the cursor condition and the page limit to a
+    ``frappe.qb`` query.
+
+    Returns ``(query, page_size)``. One extra row is fetched so that
+    :func:`split_page` can tell whether another page follows.
+    """
+    page_size = get_page_size(limit)
+
+    query = query.select(name_field.as_(CURSOR_NAME))
+    if sort_field is not None:
+        query = query.select(sort_field.as_(CURSOR_KEY))
+
+    if cursor:
+        query = query.where(after_cursor(name_field, sort_field, cursor, order))
+
+    if sort_field is not None:
+        query = query.orderby(sort_field, order=order)
+    query = query.orderby(name_field, order=order)
+
+    return query.limit(page_size + 1), page_size
+
+
+def row_position(row):
+    """Return the keyset position of a row fetched through :func:`paginate`."""
+    if CURSOR_KEY in row:
+        return [row[CURSOR_KEY], row[CURSOR_NAME]]
+    return [row[CURSOR_NAME]]
+
+
+def split_page(rows, page_size):
+    """Drop the look-ahead row and the cursor columns, returning ``(rows, next_cursor)``."""
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(row_position(rows[-1]))
+
+    for row in rows:
+        row.pop(CURSOR_NAME, None)
+        row.pop(CURSOR_KEY, None)
+
+    return rows, next_cursor
+
+
+def iter_batches(
+    build_query, name_field, sort_field=None, order=Order.asc, batch_size=None
+):
+    """
+    Yield every row matched by ``build_query()`` in lists of one keyset page,
+    so that only a single batch is held in memory.
+    """
+    cursor = None
+    while True:
+        query, page_size = paginate(
+            build_query(),
+            name_field,
+            sort_field=sort_field,
+            order=order,
+            limit=batch_size,
+            cursor=cursor,
+        )
+        rows, cursor = split_page(query.run(as_dict=True), page_size)
+        if rows:
+            yield rows
+        if not cursor:
+            break
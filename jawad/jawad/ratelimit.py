@@ -0,0 +1,116 @@
+"""
+Sliding-window rate limiting for the guest entry points.
+
+Each limited endpoint counts its requests per dimension, such as the client
+IP or a username, in a Redis sorted set holding the timestamps of the last
+``window`` seconds. The check-and-record step runs as one Lua script, so a
+burst spread across workers cannot slip past the limit. A request over the
+limit is answered with ``429`` and ``Retry-After`` before the endpoint
+touches the database.
+
+Limits are given per endpoint in code and can be overridden in the site
+config::
+
+    "jawad_rate_limits": {
+        "login": {"ip": [30, 60], "api_key": [10, 300]}
+    }
+
+where every dimension maps to ``[requests, window in seconds]``.
+"""
+
+import functools
+import hashlib
+import math
+import time
+
+import frappe
+
+from jawad.jawad.response import error_response
+
+# KEYS: one sorted set per dimension
+# ARGV: now, request id, then limit and window for every key
+SLIDING_WINDOW_SCRIPT = """
+local now = tonumber(ARGV[1])
+local retry_after = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 * i + 1])
+    local window = tonumber(ARGV[2 * i + 2])
+    redis.call("ZREMRANGEBYSCORE", key, "-inf", now - window)
+    if redis.call("ZCARD", key) >= limit then
+        local oldest = redis.call("ZRANGE", key, 0, 0, "WITHSCORES")
+        retry_after = math.max(retry_after, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry_after > 0 then
+    return tostring(retry_after)
+end
+for i, key in ipairs(KEYS) do
+    redis.call("ZADD", key, now, ARGV[2])
+    redis.call("EXPIRE", key, tonumber(ARGV[2 * i + 2]))
+end
+return "0"
+"""
+
+
+def rate_limit(name, limits):
+    """
+    Limit a whitelisted endpoint to ``limits`` requests, a mapping of
+    dimension to ``(requests, window in seconds)``.
+
+    The ``ip`` dimension counts by client IP. Any other dimension counts by
+    the request argument of that name. Dimensions missing from a request
+    are not counted.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            retry_after = _hit(name, _get_limits(name, limits), kwargs)
+            if retry_after:
+                return error_response(
+                    "Too many requests, try again later",
+                    429,
+                    headers={"Retry-After": str(retry_after)},
+                )
+            return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _get_limits(name, limits):
+    overrides = (frappe.conf.get("jawad_rate_limits") or {}).get(name) or {}
+    return {**limits, **overrides}
+
+
+def _hit(name, limits, kwargs):
+    """
+    Record a request against every dimension of ``limits``, unless one of
+    them is already full. Returns the seconds to wait, or 0.
+    """
+    cache = frappe.cache()
+    keys = []
+    argv = []
+    for dimension, (limit, window) in limits.items():
+        value = _get_dimension(dimension, kwargs)
+        if not value:
+            continue
+        digest = hashlib.sha1(str(value).encode("utf-8")).hexdigest()
+        keys.append(cache.make_key(f"jawad:ratelimit:{name}:{dimension}:{digest}"))
+        argv.extend([limit, window])
+
+    if not keys:
+        return 0
+
+    script = cache.register_script(SLIDING_WINDOW_SCRIPT)
+    retry_after = script(
+        keys=keys, args=[time.time(), frappe.generate_hash(length=12), *argv]
+    )
+    return math.ceil(float(retry_after))
+
+
+def _get_dimension(dimension, kwargs):
+    if dimension == "ip":
+        return frappe.local.request_ip
+    return kwargs.get(dimension) or frappe.form_dict.get(dimension)
@@ -0,0 +1,228 @@
+"""
+Replay a recorded traffic file against a bench site and report capacity.
+
+The file comes from :func:`jawad.jawad.traffic.export`. Every line is sent
+to ``--url`` at ``--concurrency`` parallel connections, optionally paced to
+``--rate`` requests per second, and latency and errors are reported per
+endpoint. The script only needs the standard library, so it can run from
+any machine that can reach the site::
+
+    python jawad/jawad/replay.py traffic.jsonl --url http://localhost:8000 \\
+        --concurrency 20 --rate 50 --duration 300 \\
+        --header "Authorization: token <api_key>:<api_secret>" \\
+        --set api_key=load@example.com --set api_secret=secret
+
+``--set`` fills fields that were redacted when the traffic was recorded,
+wherever the field occurs.
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+
+def load(path, overrides):
+    requests = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                requests.append(_apply_overrides(json.loads(line), overrides))
+    return requests
+
+
+def build_request(entry, base_url, headers):
+    url = base_url.rstrip("/") + entry["path"]
+    if entry.get("args"):
+        url += "?" + urlencode(entry["args"])
+
+    data = None
+    headers = dict(headers)
+    if "json" in entry:
+        data = json.dumps(entry["json"]).encode("utf-8")
+        headers["Content-Type"] = "application/json"
+    elif "form" in entry:
+        data = urlencode(entry["form"]).encode("utf-8")
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+    return Request(url, data=data, headers=headers, method=entry["method"])
+
+
+def send(request, timeout):
+    """Return ``(status, seconds)``; status is 0 when no response arrived."""
+    start = time.perf_counter()
+    try:
+        with urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except HTTPError as e:
+        status = e.code
+    except (URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def replay(
+    requests, base_url, concurrency, headers=None, rate=None, duration=None, timeout=30
+):
+    """
+    Send ``requests`` in order, looping over them until ``duration``
+    seconds have passed when it is given. Returns the results as
+    ``{endpoint: [(status, seconds), ...]}`` and the elapsed time.
+    """
+    results = defaultdict(list)
+    lock = threading.Lock()
+    # keeps a slow site from piling up an unbounded queue of submitted requests
+    slots = threading.BoundedSemaphore(concurrency * 2)
+
+    def run(entry):
+        try:
+            status, seconds = send(
+                build_request(entry, base_url, headers or {}), timeout
+            )
+            with lock:
+                results[entry["path"].rsplit("/", 1)[-1]].append((status, seconds))
+        finally:
+            slots.release()
+
+    schedule = itertools.cycle(requests) if duration else iter(requests)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for sent, entry in enumerate(schedule):
+            now = time.perf_counter()
+            if duration and now - start >= duration:
+                break
+            if rate:
+                # pace submissions so that the n-th request leaves at n / rate
+                delay = start + sent / rate - now
+                if delay > 0:
+                    time.sleep(delay)
+            slots.acquire()
+            pool.submit(run, entry)
+
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    rows = []
+    for endpoint, samples in sorted(results.items()):
+        latencies = sorted(seconds for _status, seconds in samples)
+        errors = sum(1 for status, _seconds in samples if not 200 <= status < 400)
+        rows.append(
+            {
+                "endpoint": endpoint,
+                "requests": len(samples),
+                "throughput": len(samples) / elapsed if elapsed else 0,
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p95_ms": _percentile(latencies, 95) * 1000,
+                "p99_ms": _percentile(latencies, 99) * 1000,
+                "error_rate": errors / len(samples),
+            }
+        )
+    return rows
+
+
+def print_report(rows, elapsed, out=sys.stdout):
+    total = sum(row["requests"] for row in rows)
+    throughput = total / elapsed if elapsed else 0
+    out.write(f"{total} requests in {elapsed:.1f}s ({throughput:.1f} req/s)\n\n")
+    header = ("endpoint", "requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "errors")
+    out.write("{:<40} {:>9} {:>8} {:>9} {:>9} {:>9} {:>8}\n".format(*header))
+    for row in rows:
+        out.write(
+            "{:<40} {:>9} {:>8.1f} {:>9.1f} {:>9.1f} {:>9.1f} {:>7.1%}\n".format(
+                row["endpoint"],
+                row["requests"],
+                row["throughput"],
+                row["p50_ms"],
+                row["p95_ms"],
+                row["p99_ms"],
+                row["error_rate"],
+            )
+        )
+
+
+def _percentile(values, percent):
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def _apply_overrides(value, overrides):
+    if isinstance(value, dict):
+        return {
+            key: (
+                overrides[key]
+                if key in overrides and not isinstance(item, (dict, list))
+                else _apply_overrides(item, overrides)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_apply_overrides(item, overrides) for item in value]
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("file", help="traffic file written by traffic.export")
+    parser.add_argument(
+        "--url", required=True, help="site URL, e.g. http://localhost:8000"
+    )
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--rate", type=float, help="requests per second, unpaced if omitted"
+    )
+    parser.add_argument(
+        "--duration", type=float, help="seconds to run, looping over the file"
+    )
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument(
+        "--header", action="append", default=[], help="'Name: value', repeatable"
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        help="'field=value' for a redacted field, repeatable",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = dict(item.split("=", 1) for item in args.set)
+    headers = dict(
+        (name.strip(), value.strip())
+        for name, value in (header.split(":", 1) for header in args.header)
+    )
+
+    requests = load(args.file, overrides)
+    if not requests:
+        parser.error(f"{args.file} holds no requests")
+
+    results, elapsed = replay(
+        requests,
+        args.url,
+        args.concurrency,
+        headers=headers,
+        rate=args.rate,
+        duration=args.duration,
+        timeout=args.timeout,
+    )
+    rows = summarize(results, elapsed)
+    if args.json:
+        json.dump({"elapsed": elapsed, "endpoints": rows}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_report(rows, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+JSON responses for the API endpoints.
+
+Every endpoint builds its response through :func:`json_response` or
+:func:`error_response`. Bodies are encoded with ``orjson`` when it is
+installed and with the standard library otherwise. Both encoders write
+dates, datetimes and times exactly as ``str()`` does, and Decimals as
+numbers, so endpoints can return database rows without converting them
+first. Encoding time is reported to :mod:`jawad.jawad.metrics`.
+
+The ``after_request`` hook :func:`compress_response` then compresses JSON
+bodies from ``/api/method/jawad.*`` with brotli or gzip, whichever the
+client's ``Accept-Encoding`` prefers. Bodies under
+``jawad_compression_min_size`` bytes are sent as they are, since
+compressing them costs more CPU than it saves on the wire. Streamed
+bodies are always compressed, a chunk at a time.
+"""
+
+import datetime
+import json
+import time
+import zlib
+from decimal import Decimal
+
+import frappe
+from werkzeug.wrappers import Response
+
+from jawad.jawad.metrics import add_serialization_time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = "application/json"
+API_PATH = "/api/method/jawad."
+ENCODINGS = ("br", "gzip")
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+
+
+def json_response(data, status=200, headers=None):
+    return Response(dumps(data), status=status, headers=headers, mimetype=JSON_MIMETYPE)
+
+
+def error_response(message, status, headers=None):
+    """Return the ``{"error": message}`` envelope used by every endpoint."""
+    return json_response({"error": message}, status=status, headers=headers)
+
+
+def dumps(data):
+    """Encode ``data`` as UTF-8 JSON bytes."""
+    start = time.perf_counter()
+    body = encode(data)
+    add_serialization_time(time.perf_counter() - start)
+    return body
+
+
+def encode(data):
+    if orjson is not None:
+        return orjson.dumps(
+            data,
+            default=_default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+    return stdlib_encode(data)
+
+
+def stdlib_encode(data):
+    return json.dumps(data, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+def _default(value):
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseException):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def compress_response(response=None, request=None):
+    """``after_request`` hook: compress a JSON response from a jawad endpoint."""
+    if not response or not request or not request.path.startswith(API_PATH):
+        return
+    if not frappe.conf.get("jawad_compression", True):
+        return
+
+    # the body depends on Accept-Encoding even when it is sent raw
+    response.vary.add("Accept-Encoding")
+    if (
+        response.mimetype != JSON_MIMETYPE
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+    ):
+        return
+
+    encoding = negotiate_encoding(request)
+    if not encoding:
+        return
+
+    if response.is_streamed:
+        # built here, the generator runs after the request context is gone
+        compressor = get_compressor(encoding)
+        response.response = _compress_stream(response.response, compressor)
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        min_size = frappe.conf.get("jawad_compression_min_size")
+        if len(body) < (DEFAULT_MIN_SIZE if min_size is None else min_size):
+            return
+        compressor = get_compressor(encoding)
+        response.set_data(compressor.process(body) + compressor.flush())
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # a compressed body is a different representation of the resource
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+
+
+def negotiate_encoding(request):
+    """Return ``"br"``, ``"gzip"`` or ``None`` for the request's Accept-Encoding."""
+    offered = [e for e in ENCODINGS if e != "br" or brotli is not None]
+    return request.accept_encodings.best_match(offered)
+
+
+def get_compressor(encoding):
+    """
+    Return a compressor for ``encoding`` with ``process(data)``,
+    ``flush_chunk()`` and a final ``flush()``.
+    """
+    if encoding == "br":
+        quality = frappe.conf.get("jawad_brotli_quality")
+        return _BrotliCompressor(DEFAULT_BROTLI_QUALITY if quality is None else quality)
+    level = frappe.conf.get("jawad_gzip_level")
+    return _GzipCompressor(DEFAULT_GZIP_LEVEL if level is None else level)
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        # wbits 31 writes a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def flush_chunk(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+    def flush_chunk(self):
+        return self._compressor.flush()
+
+
+def _compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            # flush every chunk so the client can parse rows as they arrive
+            data = compressor.process(chunk) + compressor.flush_chunk()
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # closes the database connection the streamed body holds
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def benchmark_encoders(data=None, rounds=20):
+    """
+    Time the available encoders on ``data``, or on a full page of
+    ``get_item_list`` when no data is given, and return the mean
+    milliseconds per encode and the body size of each.
+
+        bench --site <site> execute jawad.jawad.response.benchmark_encoders
+    """
+    if data is None:
+        from jawad.jawad.aiwago import attach_item_children
+
+        item = frappe.qb.DocType("Item")
+        data = {
+            "data": attach_item_children(
+                frappe.qb.from_(item)
+                .select(
+                    item.name.as_("id"),
+                    item.item_code,
+                    item.item_name,
+                    item.description,
+                    item.custom_name_arabic.as_("nameAr"),
+                    item.custom_brand_id.as_("brand"),
+                    item.modified,
+                )
+                .limit(1000)
+                .run(as_dict=True)
+            )
+        }
+
+    encoders = {"stdlib": stdlib_encode}
+    if orjson is not None:
+        encoders["orjson"] = encode
+
+    results = {}
+    for name, encoder in encoders.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            body = encoder(data)
+        results[name] = {
+            "ms": round((time.perf_counter() - start) * 1000 / rounds, 3),
+            "bytes": len(body),
+        }
+    return results
@@ -0,0 +1,242 @@
+"""
+Multilingual item search.
+
+Item names in every language are normalized and stored in ``Item Search
+Index``, one row per word of the name holding the text from that word to
+the end. A search is then a prefix range scan on ``(match_rank, term,
+item)`` that works the same for every script: ``juice`` finds "Orange
+Juice" through its second row. Rows for the first word have match rank 0,
+so names that start with the query rank ahead of names that only contain
+a word starting with it. Within a rank, results are ordered by name.
+
+Normalization removes case, Latin accents, Arabic diacritics and tatweel,
+folds alef, yeh, heh and kaf variants shared by Arabic and Urdu, drops the
+Devanagari nukta and maps Arabic-Indic digits to ASCII, so that a query
+typed without the marks still matches. Queries are normalized the same way.
+
+Rows are rebuilt whenever an Item is saved. Fill the index for existing
+items with::
+
+    bench --site <site> execute jawad.jawad.search.rebuild_search_index
+"""
+
+import unicodedata
+
+import frappe
+
+from jawad.jawad.pagination import (
+    InvalidPageRequest,
+    decode_cursor,
+    encode_cursor,
+    get_page_size,
+)
+
+INDEX_DOCTYPE = "Item Search Index"
+MAX_TERM_LENGTH = 140
+MAX_QUERY_LENGTH = 100
+REBUILD_BATCH_SIZE = 1000
+
+PREFIX_MATCH = 0
+WORD_MATCH = 1
+
+# language -> Item column
+LANGUAGE_COLUMNS = {
+    "en": "item_name",
+    "ar": "custom_name_arabic",
+    "hi": "custom_namehi",
+    "ur": "custom_nameur",
+}
+
+# combining marks that spelling variants differ by
+_STRIPPED = {
+    *range(0x0300, 0x0370),  # Latin accents
+    *range(0x064B, 0x0660),  # Arabic harakat, hamza and madda marks
+    0x0640,  # tatweel
+    0x0670,  # superscript alef
+    *range(0x06D6, 0x06EE),  # Quranic annotation marks
+    0x093C,  # Devanagari nukta
+    0x200C,  # zero width non-joiner
+    0x200D,  # zero width joiner
+}
+_FOLDED = {
+    "ٱ": "ا",  # alef wasla; hamza and madda forms lose their mark above
+    "ى": "ي",
+    "ی": "ي",  # Farsi / Urdu yeh
+    "ے": "ي",  # yeh barree
+    "ك": "ک",
+    "ة": "ه",
+    "ہ": "ه",  # heh goal
+    "ھ": "ه",  # heh doachashmee
+    "ۃ": "ه",
+    "ँ": "ं",  # chandrabindu as anusvara
+}
+_TRANSLATION = {code: None for code in _STRIPPED}
+_TRANSLATION.update({ord(source): target for source, target in _FOLDED.items()})
+_TRANSLATION.update({0x0660 + digit: str(digit) for digit in range(10)})
+_TRANSLATION.update({0x06F0 + digit: str(digit) for digit in range(10)})
+
+
+class InvalidSearchRequest(frappe.ValidationError):
+    pass
+
+
+def normalize(text):
+    """Return ``text`` in the script-folded, lower case form the index holds."""
+    if not text:
+        return ""
+    # NFKD splits presentation forms, precomposed hamza letters, nukta
+    # letters and accented Latin into a base letter and marks to strip
+    text = unicodedata.normalize("NFKD", text).casefold().translate(_TRANSLATION)
+    # keep letters, digits and the vowel signs Devanagari words are made of
+    words = "".join(
+        char if unicodedata.category(char)[0] in "LNM" else " " for char in text
+    ).split()
+    return unicodedata.normalize("NFC", " ".join(words))
+
+
+def get_terms(name):
+    """Return ``[(term, match_rank)]`` for every word of ``name``."""
+    words = normalize(name).split()
+    return [
+        (" ".join(words[i:])[:MAX_TERM_LENGTH], PREFIX_MATCH if i == 0 else WORD_MATCH)
+        for i in range(len(words))
+    ]
+
+
+def get_index_rows(item):
+    """Return the index rows of an item row holding the language columns."""
+    rows = {}
+    for language, column in LANGUAGE_COLUMNS.items():
+        for term, match_rank in get_terms(item.get(column)):
+            # a translation equal to another language's name adds nothing
+            rows.setdefault((term, match_rank), (item.get("name"), language))
+    return [
+        (name, language, term, match_rank)
+        for (term, match_rank), (name, language) in rows.items()
+    ]
+
+
+def index_item(doc, method=None):
+    """``doc_events`` hook: replace the index rows of a saved Item."""
+    frappe.db.delete(INDEX_DOCTYPE, {"item": doc.name})
+    _insert_rows(get_index_rows(doc.as_dict()))
+
+
+def remove_item(doc, method=None):
+    """``doc_events`` hook: drop the index rows of a deleted Item."""
+    frappe.db.delete(INDEX_DOCTYPE, {"item": doc.name})
+
+
+def rename_item(doc, method=None, old=None, new=None, merge=False):
+    """``doc_events`` hook: move the index rows of a renamed Item."""
+    frappe.db.delete(INDEX_DOCTYPE, {"item": old})
+    index_item(frappe.get_doc("Item", new))
+
+
+def rebuild_search_index():
+    """Rebuild the whole index from the Item table, committing per batch."""
+    frappe.db.truncate(INDEX_DOCTYPE)
+    item = frappe.qb.DocType("Item")
+    last_name = None
+    while True:
+        query = (
+            frappe.qb.from_(item)
+            .select(item.name, *(item.field(c) for c in LANGUAGE_COLUMNS.values()))
+            .orderby(item.name)
+            .limit(REBUILD_BATCH_SIZE)
+        )
+        if last_name is not None:
+            query = query.where(item.name > last_name)
+        items = query.run(as_dict=True)
+        if not items:
+            break
+
+        _insert_rows([row for item_row in items for row in get_index_rows(item_row)])
+        frappe.db.commit()
+        last_name = items[-1].name
+
+
+def search_items(query, limit=None, cursor=None):
+    """
+    Return ``(item names, next_cursor)`` for one page of items whose name in
+    any language has a word starting with ``query``. Prefix matches come
+    first.
+    """
+    text = normalize(query)
+    if not text:
+        raise InvalidSearchRequest("Missing search query")
+    if len(text) > MAX_QUERY_LENGTH:
+        raise InvalidSearchRequest(
+            f"Search query is longer than {MAX_QUERY_LENGTH} characters"
+        )
+
+    page_size = get_page_size(limit)
+    first_rank, position = PREFIX_MATCH, None
+    if cursor:
+        first_rank, *position = decode_cursor(cursor, 3)
+        if first_rank not in (PREFIX_MATCH, WORD_MATCH):
+            raise InvalidPageRequest("Invalid cursor")
+
+    # one extra row tells whether another page follows
+    rows = []
+    for match_rank in range(first_rank, WORD_MATCH + 1):
+        rows += _read_matches(
+            text,
+            match_rank,
+            position if match_rank == first_rank else None,
+            page_size + 1 - len(rows),
+        )
+        if len(rows) > page_size:
+            break
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.match_rank, last.term, last.item])
+    return [row.item for row in rows], next_cursor
+
+
+def _read_matches(text, match_rank, position, count):
+    """
+    Read ``count`` matches of one rank after ``position``. An item matching
+    through several words or languages is returned only for its best row,
+    so it shows up once across all pages.
+    """
+    values = {"rank": match_rank, "prefix": f"{text}%", "count": count}
+    after = ""
+    if position:
+        values["term"], values["item"] = position
+        after = """AND (`entry`.`term` > %(term)s
+            OR (`entry`.`term` = %(term)s AND `entry`.`item` > %(item)s))"""
+
+    return frappe.db.sql(
+        f"""
+        SELECT `entry`.`match_rank`, `entry`.`term`, `entry`.`item`
+        FROM `tab{INDEX_DOCTYPE}` AS `entry`
+        WHERE `entry`.`match_rank` = %(rank)s
+            AND `entry`.`term` LIKE %(prefix)s
+            {after}
+            AND NOT EXISTS (
+                SELECT 1 FROM `tab{INDEX_DOCTYPE}` AS `other`
+                WHERE `other`.`item` = `entry`.`item`
+                    AND `other`.`term` LIKE %(prefix)s
+                    AND (`other`.`match_rank` < `entry`.`match_rank`
+                        OR (`other`.`match_rank` = `entry`.`match_rank`
+                            AND `other`.`term` < `entry`.`term`))
+            )
+        ORDER BY `entry`.`term`, `entry`.`item`
+        LIMIT %(count)s
+        """,
+        values,
+        as_dict=True,
+    )
+
+
+def _insert_rows(rows):
+    if rows:
+        frappe.db.bulk_insert(
+            INDEX_DOCTYPE,
+            fields=["item", "language", "term", "match_rank"],
+            values=rows,
+        )
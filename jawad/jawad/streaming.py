@@ -0,0 +1,67 @@
+"""
+Streaming JSON responses for large collections.
+
+The response body is a generator, so rows are read, serialized and written
+to the socket a chunk at a time instead of being held in memory as a list,
+a list of dicts and one big string all at once.
+
+Frappe closes the request's database connection before the WSGI server
+starts iterating the body. ``frappe.db`` reconnects on the first query the
+generator runs, and the generator closes that connection again when it is
+exhausted or the client goes away.
+"""
+
+import frappe
+from werkzeug.wrappers import Response
+
+from jawad.jawad.response import JSON_MIMETYPE, encode
+
+CHUNK_SIZE = 64 * 1024
+
+
+def iter_query(query):
+    """Yield the rows of a ``frappe.qb`` query from a server-side cursor."""
+    with frappe.db.unbuffered_cursor():
+        yield from query.run(as_dict=True, as_iterator=True)
+
+
+def stream_response(rows, key="data", status=200, headers=None):
+    """
+    Return a ``Response`` that writes ``{"<key>": [...rows]}`` as ``rows``
+    is consumed. ``rows`` must be lazy (a generator) for this to help.
+    """
+    return Response(
+        _generate(rows, key),
+        status=status,
+        headers=headers,
+        mimetype=JSON_MIMETYPE,
+    )
+
+
+def _generate(rows, key):
+    buffer = [b"{" + encode(key) + b":["]
+    size = len(buffer[0])
+    first = True
+    try:
+        for row in rows:
+            chunk = encode(row) if first else b"," + encode(row)
+            first = False
+            buffer.append(chunk)
+            size += len(chunk)
+            if size >= CHUNK_SIZE:
+                yield b"".join(buffer)
+                buffer, size = [], 0
+
+        buffer.append(b"]}")
+        yield b"".join(buffer)
+
+    except GeneratorExit:
+        raise
+    except Exception:
+        # the status line is already sent; leave the JSON unterminated so
+        # the client sees a truncated body rather than a short, valid list
+        frappe.log_error(title="Streaming Response Error")
+        frappe.db.commit()
+        raise
+    finally:
+        frappe.db.close()
@@ -0,0 +1,234 @@
+"""
+Delta sync for the mobile app.
+
+Clients keep a server-issued sync token holding, for every synced doctype and
+for the tombstone log, the ``(modified, name)`` position they have read up
+to. Each call returns the next batch of changes after those positions plus
+a new token. Deletions are reported through ``Sync Tombstone`` rows written
+from ``on_trash``, so clients never need a full resync to notice them.
+
+Rows modified in the last few seconds are held back until the next call.
+This leaves room for transactions that were still open when the batch was
+read to commit with an earlier ``modified`` than the position handed out.
+"""
+
+import frappe
+from frappe.model import default_fields
+from frappe.utils import add_days, add_to_date, get_datetime, now_datetime
+
+from jawad.jawad.pagination import (
+    InvalidPageRequest,
+    decode_token,
+    encode_cursor,
+    encode_token,
+    get_page_size,
+    paginate,
+    row_position,
+    split_page,
+)
+
+TOKEN_VERSION = 1
+SYNC_LAG_SECONDS = 2
+TOMBSTONE_RETENTION_DAYS = 90
+TOMBSTONES = "tombstones"
+
+# doctype -> (response key, {output field: column}); custom columns a site
+# does not have, such as Branch.city, are left out of the response
+SYNC_DOCTYPES = {
+    "Item": (
+        "products",
+        {"product_id": "item_code", "product_name": "item_name"},
+    ),
+    "Customer": (
+        "customers",
+        {"id": "name", "name": "customer_name"},
+    ),
+    "Brand": (
+        "brands",
+        {"id": "name", "brand_name": "brand", "description": "description"},
+    ),
+    "Item Group": (
+        "item_groups",
+        {"id": "name", "name": "item_group_name", "parent": "parent_item_group"},
+    ),
+    "Branch": (
+        "branches",
+        {"id": "name", "name": "branch", "city": "city"},
+    ),
+    "Promotional Scheme": (
+        "promotions",
+        {
+            "id": "name",
+            "disabled": "disable",
+            "valid_from": "valid_from",
+            "valid_upto": "valid_upto",
+        },
+    ),
+}
+
+
+class SyncTokenExpired(frappe.ValidationError):
+    pass
+
+
+def get_changes(sync_token=None, updated_at=None, limit=None):
+    """
+    Return the changes after ``sync_token``, or after the ``updated_at``
+    timestamp for clients that have not received a token yet.
+    """
+    positions = (
+        _decode_sync_token(sync_token) if sync_token else _initial_positions(updated_at)
+    )
+    page_size = get_page_size(limit)
+    upper = add_to_date(
+        now_datetime(),
+        seconds=-(frappe.conf.get("jawad_sync_lag_seconds") or SYNC_LAG_SECONDS),
+    )
+
+    result = {}
+    next_positions = {}
+    has_more = False
+
+    for doctype, (key, fields) in SYNC_DOCTYPES.items():
+        table = frappe.qb.DocType(doctype)
+        query = frappe.qb.from_(table).select(
+            *(
+                table.field(column).as_(field)
+                for field, column in _existing_columns(doctype, fields).items()
+            ),
+            table.modified.as_("updated_at"),
+        )
+        rows, next_positions[doctype], more = _read_batch(
+            query, table, table.modified, positions[doctype], upper, page_size
+        )
+        result[key] = rows
+        has_more = has_more or more
+
+    tombstone = frappe.qb.DocType("Sync Tombstone")
+    query = (
+        frappe.qb.from_(tombstone)
+        .select(
+            tombstone.reference_doctype.as_("doctype"),
+            tombstone.reference_name.as_("id"),
+            tombstone.creation.as_("deleted_at"),
+        )
+        .where(tombstone.reference_doctype.isin(list(SYNC_DOCTYPES)))
+    )
+    deleted, next_positions[TOMBSTONES], more = _read_batch(
+        query, tombstone, tombstone.creation, positions[TOMBSTONES], upper, page_size
+    )
+
+    result["deleted"] = deleted
+    result["has_more"] = has_more or more
+    result["sync_token"] = encode_token({"v": TOKEN_VERSION, "p": next_positions})
+    return result
+
+
+def _existing_columns(doctype, fields):
+    meta = frappe.get_meta(doctype)
+    return {
+        field: column
+        for field, column in fields.items()
+        if column in default_fields or meta.has_field(column)
+    }
+
+
+def _read_batch(query, table, sort_field, position, upper, page_size):
+    query, page_size = paginate(
+        query.where(sort_field < upper),
+        table.name,
+        sort_field=sort_field,
+        limit=page_size,
+        cursor=encode_cursor(position),
+    )
+    rows = query.run(as_dict=True)
+    more = len(rows) > page_size
+    if more:
+        next_position = row_position(rows[page_size - 1])
+    else:
+        # everything before ``upper`` has been read, so the next call can
+        # start there instead of re-scanning from the last row
+        next_position = [upper, ""]
+    rows, _ = split_page(rows, page_size)
+    return rows, next_position, more
+
+
+def _initial_positions(updated_at):
+    try:
+        since = get_datetime(updated_at)
+    except Exception:
+        raise InvalidPageRequest(f"Invalid updated_at: {updated_at}")
+
+    # ``name > ''`` holds for every row, so this reads ``modified >= since``
+    positions = {doctype: [since, ""] for doctype in SYNC_DOCTYPES}
+    positions[TOMBSTONES] = [since, ""]
+    return positions
+
+
+def _decode_sync_token(sync_token):
+    try:
+        token = decode_token(sync_token)
+        positions = token["p"]
+        valid = token.get("v") == TOKEN_VERSION and all(
+            isinstance(positions.get(key), list) and len(positions[key]) == 2
+            for key in [*SYNC_DOCTYPES, TOMBSTONES]
+        )
+    except Exception:
+        valid = False
+
+    if not valid:
+        raise InvalidPageRequest("Invalid sync_token")
+
+    if get_datetime(positions[TOMBSTONES][0]) < add_days(
+        now_datetime(), -get_tombstone_retention_days()
+    ):
+        raise SyncTokenExpired(
+            "sync_token is older than the deletion log, run a full sync"
+        )
+    return positions
+
+
+def get_tombstone_retention_days():
+    return frappe.conf.get("jawad_sync_tombstone_days") or TOMBSTONE_RETENTION_DAYS
+
+
+def record_tombstone(doc, method=None):
+    """``on_trash`` hook: remember the deletion for syncing clients."""
+    frappe.get_doc(
+        {
+            "doctype": "Sync Tombstone",
+            "reference_doctype": doc.doctype,
+            "reference_name": doc.name,
+        }
+    ).insert(ignore_permissions=True)
+
+
+def record_rename_tombstone(doc, method=None, old=None, new=None, merge=False):
+    """``after_rename`` hook: the old name is gone for syncing clients."""
+    frappe.get_doc(
+        {
+            "doctype": "Sync Tombstone",
+            "reference_doctype": doc.doctype,
+            "reference_name": old,
+        }
+    ).insert(ignore_permissions=True)
+    clear_tombstone(doc)
+
+
+def clear_tombstone(doc, method=None):
+    """
+    ``after_insert`` hook: a document re-created under a deleted name must not
+    be removed again by a client that reads the old tombstone late.
+    """
+    frappe.db.delete(
+        "Sync Tombstone",
+        {"reference_doctype": doc.doctype, "reference_name": doc.name},
+    )
+
+
+def purge_tombstones():
+    """Daily job: drop tombstones older than the retention window."""
+    frappe.db.delete(
+        "Sync Tombstone",
+        {"creation": ["<", add_days(now_datetime(), -get_tombstone_retention_days())]},
+    )
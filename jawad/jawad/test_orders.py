@@ -0,0 +1,60 @@
+# Copyright (c) 2026, erp and Contributors
+# See license.txt
+
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import set_request
+
+from jawad.jawad import apis
+
+ITEM_CODE = "990100"
+CUSTOMER = "_Test Jawad Order Customer"
+
+
+class TestPostOrder(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not frappe.db.exists("Customer", CUSTOMER):
+            frappe.get_doc(
+                {
+                    "doctype": "Customer",
+                    "customer_name": CUSTOMER,
+                    "customer_group": "All Customer Groups",
+                    "territory": "All Territories",
+                }
+            ).insert(ignore_permissions=True)
+        if not frappe.db.exists("Item", ITEM_CODE):
+            frappe.get_doc(
+                {
+                    "doctype": "Item",
+                    "item_code": ITEM_CODE,
+                    "item_name": "_Test Jawad Order Item",
+                    "item_group": "All Item Groups",
+                    "stock_uom": "Nos",
+                    "is_stock_item": 0,
+                }
+            ).insert(ignore_permissions=True)
+
+    def test_integer_product_id(self):
+        # product_list hands out product_id as an integer, and the app posts
+        # it back as one
+        set_request(method="POST", path="/api/method/jawad.jawad.apis.post_order")
+        self.addCleanup(delattr, frappe.local, "request")
+        frappe.local.form_dict = frappe._dict(
+            items=json.dumps(
+                [{"product_id": int(ITEM_CODE), "quantity": 2, "price": 10}]
+            )
+        )
+
+        response = apis.post_order(
+            customer_id=CUSTOMER, branch_id=None, promotion_code=None, total=20
+        )
+
+        self.assertEqual(response.status_code, 200, response.get_data(as_text=True))
+        order = frappe.get_doc("Sales Order", json.loads(response.get_data())["id"])
+        self.assertEqual(
+            [(row.item_code, row.qty) for row in order.items], [(ITEM_CODE, 2)]
+        )
@@ -0,0 +1,253 @@
+# Copyright (c) 2026, erp and Contributors
+# See license.txt
+
+"""
+SQL statement budgets for the read endpoints.
+
+Every endpoint is called once with a small data set and once more after the
+data set has grown. The number of statements must stay the same, which
+catches per-row queries, and must stay within the endpoint's budget.
+Statements are counted on ``frappe.db.sql``, which query builder and
+``frappe.get_all`` calls go through as well.
+"""
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime, set_request, today
+
+from jawad.jawad import aiwago, apis, search
+from jawad.jawad.pagination import encode_cursor
+
+SMALL = 2
+LARGE = 10
+PREFIX = "_QB"
+ITEM_CODE_START = 990000
+CUSTOMER = f"{PREFIX} Customer 0"
+
+# endpoint -> (function, kwargs, statement budget); kwargs may instead be a
+# function of the number of seeded records that returns them
+ENDPOINTS = {
+    "categories_List": (apis.categories_List, {}, 2),
+    "updated_or_newly_added_items": (
+        apis.updated_or_newly_added_items,
+        {"updated_at": "2000-01-01", "limit": 1000},
+        7,
+    ),
+    "valid_promotion_list": (apis.valid_promotion_list, {"limit": 1000}, 3),
+    "customer_list": (apis.customer_list, {"limit": 1000}, 2),
+    "order_list": (apis.order_list, {"customer_id": CUSTOMER, "limit": 1000}, 2),
+    "branches_list": (apis.branches_list, {"limit": 1000}, 2),
+    # exactly the seeded items: product_list cannot serialize the items with
+    # non-numeric names or skus that other apps' test records add
+    "product_list": (
+        apis.product_list,
+        lambda records: {
+            "cursor": encode_cursor([str(ITEM_CODE_START - 1)]),
+            "limit": records,
+        },
+        6,
+    ),
+    "get_item_list": (aiwago.get_item_list, {"limit": 1000}, 4),
+    # child tables that were not asked for are not read
+    "get_item_list_sparse": (
+        aiwago.get_item_list,
+        {"limit": 1000, "fields": "id,item_name"},
+        2,
+    ),
+    "get_item_list_filtered": (
+        aiwago.get_item_list,
+        {"limit": 1000, "channelid": "Baqala"},
+        4,
+    ),
+    "get_brand_list": (aiwago.get_brand_list, {"limit": 1000}, 2),
+    "search_items": (aiwago.search_items, {"query": PREFIX, "limit": 1000}, 3),
+}
+
+# site-specific columns some endpoints read, which a bare site may lack
+REQUIRED_COLUMNS = {
+    "branches_list": [("Branch", "city")],
+    "product_list": [
+        ("Item", "sku"),
+        ("Branch", "warehouse"),
+        ("Branch", "stock"),
+    ],
+}
+
+
+class TestQueryBudget(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        set_request(method="GET", path="/api/method/jawad.jawad.apis.product_list")
+        cls.addClassCleanup(delattr, frappe.local, "request")
+
+        seed(0, SMALL)
+        cls.small = {endpoint: measure(endpoint, SMALL) for endpoint in ENDPOINTS}
+        seed(SMALL, LARGE)
+        cls.large = {endpoint: measure(endpoint, LARGE) for endpoint in ENDPOINTS}
+
+    def assertWithinBudget(self, endpoint):
+        for doctype, column in REQUIRED_COLUMNS.get(endpoint, []):
+            if not frappe.db.has_column(doctype, column):
+                self.skipTest(f"{doctype} has no {column} column on this site")
+
+        small, small_status = self.small[endpoint]
+        large, large_status = self.large[endpoint]
+        self.assertEqual(small_status, 200)
+        self.assertEqual(large_status, 200)
+
+        self.assertEqual(
+            small,
+            large,
+            f"{endpoint} ran {small} statements for {SMALL} records "
+            f"but {large} for {LARGE}",
+        )
+        budget = ENDPOINTS[endpoint][2]
+        self.assertLessEqual(
+            large, budget, f"{endpoint} ran {large} statements, budget is {budget}"
+        )
+
+    def test_categories_list(self):
+        self.assertWithinBudget("categories_List")
+
+    def test_updated_or_newly_added_items(self):
+        self.assertWithinBudget("updated_or_newly_added_items")
+
+    def test_valid_promotion_list(self):
+        self.assertWithinBudget("valid_promotion_list")
+
+    def test_customer_list(self):
+        self.assertWithinBudget("customer_list")
+
+    def test_order_list(self):
+        self.assertWithinBudget("order_list")
+
+    def test_branches_list(self):
+        self.assertWithinBudget("branches_list")
+
+    def test_product_list(self):
+        self.assertWithinBudget("product_list")
+
+    def test_get_item_list(self):
+        self.assertWithinBudget("get_item_list")
+
+    def test_get_item_list_sparse(self):
+        self.assertWithinBudget("get_item_list_sparse")
+
+    def test_get_item_list_filtered(self):
+        self.assertWithinBudget("get_item_list_filtered")
+
+    def test_get_brand_list(self):
+        self.assertWithinBudget("get_brand_list")
+
+    def test_search_items(self):
+        self.assertWithinBudget("search_items")
+
+
+def measure(endpoint, records):
+    """Return ``(statements, status)`` of an uncached call of ``endpoint``."""
+    fn, kwargs, _budget = ENDPOINTS[endpoint]
+    if callable(kwargs):
+        kwargs = kwargs(records)
+
+    # the first call loads doctype meta, which later calls read from cache
+    fn(**kwargs)
+    frappe.cache().delete_keys("jawad:cache:")
+
+    with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+        response = fn(**kwargs)
+    return sql.call_count, response.status_code
+
+
+def seed(start, stop):
+    """Insert records ``start`` to ``stop - 1`` of every seeded doctype."""
+    for i in range(start, stop):
+        code = str(ITEM_CODE_START + i)
+        branch = f"{PREFIX} Branch {i}"
+        promotion = f"{PREFIX} Promotion {i}"
+
+        insert("Brand", name=f"{PREFIX} Brand {i}", brand=f"{PREFIX} Brand {i}")
+        insert(
+            "Item Group",
+            name=f"{PREFIX} Group {i}",
+            item_group_name=f"{PREFIX} Group {i}",
+            parent_item_group="All Item Groups",
+        )
+        insert("Branch", name=branch, branch=branch, city="Dubai", stock=1)
+        insert("Customer", name=f"{PREFIX} Customer {i}", customer_name=f"Customer {i}")
+        insert(
+            "Sales Order",
+            name=f"{PREFIX}-SO-{i}",
+            customer=CUSTOMER,
+            transaction_date=today(),
+            delivery_date=today(),
+            grand_total=100,
+        )
+        insert(
+            "Promotional Scheme",
+            name=promotion,
+            disable=0,
+            valid_from=today(),
+        )
+        insert(
+            "Promotional Scheme Price Discount",
+            parent=promotion,
+            parenttype="Promotional Scheme",
+            parentfield="price_discount_slabs",
+            rate_or_discount="Discount Percentage",
+            max_amount=50,
+        )
+
+        item = insert(
+            "Item",
+            name=code,
+            item_code=code,
+            item_name=f"{PREFIX} Item {i}",
+            item_group="All Item Groups",
+            stock_uom="Nos",
+            sku=code,
+            custom_brand_id=f"{PREFIX} Brand {i}",
+        )
+        search.index_item(item)
+        insert(
+            "media",
+            parent=code,
+            parenttype="Item",
+            parentfield="custom_subcatimg",
+            media=f"/files/{code}.png",
+        )
+        insert(
+            "channelCatSubCat",
+            parent=code,
+            parenttype="Item",
+            parentfield="custom_channelcatsubcat",
+            channelid="Baqala",
+        )
+        insert(
+            "branch doc",
+            parent=code,
+            parenttype="Item",
+            parentfield="branches",
+            branch=branch,
+        )
+        insert(
+            "Item Price",
+            item_code=code,
+            price_list="Standard Selling",
+            price_list_rate=10,
+        )
+
+
+def insert(doctype, **values):
+    """Insert a row without running validations, which the budgets do not need."""
+    # older than the sync lag window, so the sync endpoint returns it
+    timestamp = add_to_date(now_datetime(), hours=-1)
+    doc = frappe.get_doc(
+        {"doctype": doctype, "creation": timestamp, "modified": timestamp, **values}
+    )
+    if not doc.name:
+        doc.name = frappe.generate_hash(length=10)
+    doc.db_insert()
+    return doc
@@ -0,0 +1,73 @@
+# Copyright (c) 2026, erp and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.test_api import FrappeAPITestCase
+
+from jawad.jawad.tokens import signed_token_fields, verify
+
+SIGNED_TOKEN_CONF = {"jawad_signed_tokens": 1, "jawad_token_secret": "test-secret"}
+
+
+class TestSignedTokenRevocation(FrappeAPITestCase):
+    def setUp(self):
+        self.client = frappe.get_doc(
+            {
+                "doctype": "OAuth Client",
+                "app_name": "_Test Signed Tokens",
+                "scopes": "all",
+                "redirect_uris": "http://localhost",
+                "default_redirect_uri": "http://localhost",
+                "grant_type": "Authorization Code",
+                "response_type": "Code",
+                "skip_authorization": 1,
+            }
+        ).insert(ignore_permissions=True)
+        self.bearer_token = frappe.get_doc(
+            {
+                "doctype": "OAuth Bearer Token",
+                "client": self.client.name,
+                "user": "Administrator",
+                "scopes": "all",
+                "access_token": frappe.generate_hash(length=30),
+                "refresh_token": frappe.generate_hash(length=30),
+                "expires_in": 3600,
+                "status": "Active",
+            }
+        ).insert(ignore_permissions=True)
+        # the endpoint runs on its own connection
+        frappe.db.commit()
+
+    def tearDown(self):
+        frappe.delete_doc("OAuth Bearer Token", self.bearer_token.name, force=True)
+        frappe.delete_doc("OAuth Client", self.client.name, force=True)
+        frappe.db.commit()
+
+    def test_standard_revoke_endpoint_revokes_signed_tokens(self):
+        with patch.dict(frappe.conf, SIGNED_TOKEN_CONF):
+            signed_token = signed_token_fields(
+                {"access_token": self.bearer_token.access_token, "scope": "all"}
+            )["signed_access_token"]
+            self.assertEqual(verify(signed_token)["sub"], "Administrator")
+
+            response = self.post(
+                self.method_path("frappe.integrations.oauth2.revoke_token"),
+                {
+                    "token": self.bearer_token.access_token,
+                    "token_type_hint": "access_token",
+                    "client_id": self.client.name,
+                    "sid": self.sid,
+                },
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                frappe.db.get_value(
+                    "OAuth Bearer Token", self.bearer_token.name, "status"
+                ),
+                "Revoked",
+            )
+
+            with self.assertRaises(frappe.AuthenticationError):
+                verify(signed_token)
@@ -0,0 +1,68 @@
+# Copyright (c) 2026, erp and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from jawad.jawad.traffic import REDACTED, sanitize
+
+# a create_customer body as the app sends it
+CREATE_CUSTOMER = {
+    "name": "Al Noor Trading",
+    "first_name": "Ahmed",
+    "last_name": "Khan",
+    "phone": "501234567",
+    "email": "ahmed@example.com",
+    "country_code": "+971",
+    "customer_id": "CUST-0001",
+    "user_id": "ahmed@example.com",
+    "customer_email": "ahmed@example.com",
+    "address": "Shop 4, Al Quoz, Dubai",
+    "address_display": "Shop 4<br>Al Quoz<br>Dubai",
+    "shipping_address": "Warehouse 7, Jebel Ali",
+    "vat_number": "100123456700003",
+    "cr_number": "CN-1234567",
+    "address_proof_front": "/files/address_front.jpg",
+    "address_proof_back": "/files/address_back.jpg",
+    "cr_document_front": "/files/cr_front.jpg",
+    "cr_document_back": "/files/cr_back.jpg",
+    "vat_doc_front": "/files/vat_front.jpg",
+    "vat_doc_back": "/files/vat_back.jpg",
+    "id_proof_front": "/files/id_front.jpg",
+    "id_proof_back": "/files/id_back.jpg",
+    "shop_image_front": "/files/shop_front.jpg",
+    "shop_image_back": "/files/shop_back.jpg",
+    "profile_image": "/files/profile.jpg",
+    "channel_id": "Baqala",
+    "classification": "Retail",
+    "added_type": "App",
+    "credit_days": 30,
+    "is_company": True,
+    "contacts": [{"phone": "501234568", "relation": "Partner"}],
+}
+
+
+class TestTrafficSanitize(FrappeTestCase):
+    def test_create_customer_keeps_no_personal_data(self):
+        sanitized = sanitize(CREATE_CUSTOMER)
+
+        self.assertEqual(set(sanitized), set(CREATE_CUSTOMER))
+        for key in ("channel_id", "classification", "added_type", "country_code"):
+            self.assertEqual(sanitized[key], CREATE_CUSTOMER[key])
+
+        recorded = str(sanitized)
+        for key, value in CREATE_CUSTOMER.items():
+            if key in ("channel_id", "classification", "added_type", "country_code"):
+                continue
+            if isinstance(value, str):
+                self.assertEqual(sanitized[key], REDACTED, key)
+                self.assertNotIn(value, recorded, key)
+
+        self.assertEqual(sanitized["credit_days"], 0)
+        self.assertIs(sanitized["is_company"], False)
+        self.assertEqual(
+            sanitized["contacts"], [{"phone": REDACTED, "relation": REDACTED}]
+        )
+
+    def test_paging_and_filters_are_kept(self):
+        args = {"limit": "50", "cursor": "WyIxMCJd", "channelid": "Baqala"}
+        self.assertEqual(sanitize(args), args)
@@ -0,0 +1,181 @@
+"""
+Signed access tokens for the mobile API.
+
+With ``jawad_signed_tokens`` enabled in the site config, the login and
+refresh endpoints also hand out a short-lived HS256 JWT carrying the user
+and scopes of the OAuth bearer token they issued. Clients send it as
+``Authorization: JWT <token>`` to the ``jawad.*`` endpoints, and
+:func:`validate_auth` accepts it after a signature check and a single Redis
+read of the revocation entries, without the ``OAuth Bearer Token`` lookup
+Frappe does for every bearer request.
+
+A token is revoked with the bearer token it was issued for, and every token
+of a user is revoked when the user is disabled or deleted. Frappe's own
+``revoke_token`` endpoint marks bearer tokens revoked with
+``frappe.db.set_value``, which runs no document hooks, so it is overridden
+by :func:`revoke_token` to revoke their signed tokens as well. Revocation
+keys expire together with the longest-lived token they could match.
+"""
+
+import hashlib
+import time
+
+import frappe
+import jwt
+
+ALGORITHM = "HS256"
+AUTH_SCHEME = "jwt"
+DEFAULT_TTL = 15 * 60
+LEEWAY = 30
+API_PATH = "/api/method/jawad."
+
+
+def is_enabled():
+    return bool(frappe.conf.get("jawad_signed_tokens"))
+
+
+def get_ttl():
+    return frappe.conf.get("jawad_signed_token_ttl") or DEFAULT_TTL
+
+
+def signed_token_fields(token):
+    """
+    Return the fields to add to an OAuth token response ``token``:
+    ``signed_access_token`` and ``signed_expires_in``, or nothing when
+    signed tokens are disabled.
+    """
+    if not is_enabled() or not token.get("access_token"):
+        return {}
+
+    user = frappe.db.get_value(
+        "OAuth Bearer Token", {"access_token": token["access_token"]}, "user"
+    )
+    if not user:
+        return {}
+
+    now = int(time.time())
+    ttl = get_ttl()
+    claims = {
+        "iss": frappe.local.site,
+        "sub": user,
+        "scope": token.get("scope") or "",
+        "bt": _bearer_token_id(token["access_token"]),
+        "jti": frappe.generate_hash(length=16),
+        "iat": now,
+        "exp": now + ttl,
+    }
+    return {
+        "signed_access_token": jwt.encode(claims, _get_secret(), algorithm=ALGORITHM),
+        "signed_expires_in": ttl,
+    }
+
+
+def verify(token):
+    """Return the claims of a signed token, or raise ``frappe.AuthenticationError``."""
+    try:
+        claims = jwt.decode(
+            token,
+            _get_secret(),
+            algorithms=[ALGORITHM],
+            issuer=frappe.local.site,
+            leeway=LEEWAY,
+            options={"require": ["exp", "iat", "sub", "bt"]},
+        )
+    except jwt.InvalidTokenError:
+        raise frappe.AuthenticationError("Invalid or expired token")
+
+    cache = frappe.cache()
+    revoked, not_before = cache.mget(
+        [_revoked_key(claims["bt"]), _not_before_key(claims["sub"])]
+    )
+    if revoked or (not_before and claims["iat"] <= int(not_before)):
+        raise frappe.AuthenticationError("Token has been revoked")
+    return claims
+
+
+def validate_auth():
+    """
+    ``auth_hooks`` entry: log the request in as the user of a valid
+    ``Authorization: JWT <token>`` header.
+    """
+    scheme, _, token = frappe.get_request_header("Authorization", "").partition(" ")
+    if scheme.lower() != AUTH_SCHEME or not token or not is_enabled():
+        return
+    if not frappe.request.path.startswith(API_PATH):
+        return
+
+    claims = verify(token.strip())
+    form_dict = frappe.local.form_dict
+    frappe.set_user(claims["sub"])
+    frappe.local.form_dict = form_dict
+
+
+def revoke_bearer_token(doc, method=None):
+    """
+    ``doc_events`` hook on OAuth Bearer Token: revoke the signed tokens
+    issued with a bearer token once it is revoked or deleted.
+    """
+    if method == "on_update" and doc.status != "Revoked":
+        return
+    _revoke(doc.access_token)
+
+
+@frappe.whitelist(allow_guest=True)
+def revoke_token(*args, **kwargs):
+    """
+    Override of ``frappe.integrations.oauth2.revoke_token``: revoke the
+    bearer token as Frappe does, then the signed tokens issued with it.
+    """
+    from frappe.integrations.oauth2 import revoke_token as frappe_revoke_token
+
+    response = frappe_revoke_token(*args, **kwargs)
+    token = frappe.form_dict.get("token")
+    if token:
+        # the token is either the access token, which names the document,
+        # or the refresh token
+        revoked = frappe.get_all(
+            "OAuth Bearer Token",
+            filters={"status": "Revoked"},
+            or_filters={"name": token, "refresh_token": token},
+            pluck="access_token",
+        )
+        for access_token in revoked:
+            _revoke(access_token)
+    return response
+
+
+def revoke_user_tokens(doc, method=None):
+    """
+    ``doc_events`` hook on User: revoke every signed token of a user who is
+    disabled or deleted.
+    """
+    if method == "on_update" and doc.enabled:
+        return
+    frappe.cache().set(
+        _not_before_key(doc.name), int(time.time()), ex=get_ttl() + LEEWAY
+    )
+
+
+def _revoke(access_token):
+    frappe.cache().set(
+        _revoked_key(_bearer_token_id(access_token)), 1, ex=get_ttl() + LEEWAY
+    )
+
+
+def _get_secret():
+    secret = frappe.conf.get("jawad_token_secret") or frappe.conf.get("encryption_key")
+    if not secret:
+        raise frappe.AuthenticationError("Signed tokens are not configured")
+    return secret
+
+
+def _bearer_token_id(access_token):
+    return hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:32]
+
+
+def _revoked_key(bearer_token_id):
+    return frappe.cache().make_key(f"jawad:tokens:revoked:{bearer_token_id}")
+
+
+def _not_before_key(user):
+    return frappe.cache().make_key(f"jawad:tokens:not_before:{user}")
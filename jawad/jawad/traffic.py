@@ -0,0 +1,139 @@
+"""
+Sampled recording of mobile API traffic for load tests.
+
+With ``jawad_traffic_sample_rate`` set in the site config, the
+``after_request`` hook keeps that share of the requests to
+``/api/method/jawad.*``. For each one it stores the method, path, query
+arguments and JSON body in a capped Redis list. Only paging, filter and
+catalog fields listed in ``SAFE_FIELDS`` keep their values; every other
+value is replaced by a placeholder of the same type (``REDACTED`` for
+strings) before anything is stored, and request headers are not recorded
+at all.
+
+Export the recording to a replay file with::
+
+    bench --site <site> execute jawad.jawad.traffic.export \\
+        --kwargs "{'path': '/tmp/traffic.jsonl'}"
+
+and replay it with ``jawad/jawad/replay.py``.
+"""
+
+import json
+import random
+import time
+
+import frappe
+
+TRAFFIC_QUEUE = "jawad:traffic"
+API_PATH = "/api/method/jawad."
+MAX_RECORDED_REQUESTS = 50000
+MAX_BODY_SIZE = 64 * 1024
+
+REDACTED = "REDACTED"
+# keys whose values are kept as recorded: paging, filters and catalog
+# references that replays need and that identify no person. Every other
+# scalar, at any depth, is replaced by a placeholder of the same type.
+SAFE_FIELDS = {
+    "limit",
+    "cursor",
+    "stream",
+    "fields",
+    "updated_at",
+    "sync_token",
+    "id",
+    "product_id",
+    "item",
+    "item_code",
+    "qty",
+    "quantity",
+    "rate",
+    "price",
+    "uom",
+    "channelid",
+    "channel_id",
+    "categoryid",
+    "subcategoryid",
+    "brand",
+    "brand_id",
+    "company",
+    "warehouse_code",
+    "classification",
+    "added_type",
+    "country_code",
+    "apply_on",
+    "promo_type",
+    "selling",
+    "buying",
+    "valid_from",
+    "valid_upto",
+    "query",
+    "async",
+    "batch_size",
+}
+
+
+def record_request(response=None, request=None):
+    """``after_request`` hook: sample a request into the traffic recording."""
+    rate = frappe.conf.get("jawad_traffic_sample_rate")
+    if not rate or not request or not request.path.startswith(API_PATH):
+        return
+    if random.random() >= float(rate):
+        return
+
+    entry = {
+        "t": round(time.time(), 3),
+        "method": request.method,
+        "path": request.path,
+        "args": sanitize(request.args.to_dict()),
+        "status": getattr(response, "status_code", None),
+    }
+    if request.is_json and request.content_length:
+        if request.content_length > MAX_BODY_SIZE:
+            return
+        try:
+            entry["json"] = sanitize(json.loads(request.get_data()))
+        except ValueError:
+            return
+    elif request.form:
+        entry["form"] = sanitize(request.form.to_dict())
+
+    cache = frappe.cache()
+    cache.lpush(TRAFFIC_QUEUE, json.dumps(entry, default=str))
+    cache.ltrim(TRAFFIC_QUEUE, 0, MAX_RECORDED_REQUESTS - 1)
+
+
+def sanitize(value, key=None):
+    """
+    Keep the structure of ``value`` and the values of :data:`SAFE_FIELDS`,
+    and replace every other scalar by a placeholder of the same type.
+    """
+    if isinstance(value, dict):
+        return {
+            item_key: sanitize(item, item_key.lower())
+            for item_key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [sanitize(item, key) for item in value]
+    if value is None or key in SAFE_FIELDS:
+        return value
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return type(value)(0)
+    return REDACTED
+
+
+def export(path, clear=False):
+    """
+    Write the recorded requests to ``path`` as JSON lines, oldest first,
+    and return how many were written.
+    """
+    cache = frappe.cache()
+    entries = cache.lrange(TRAFFIC_QUEUE, 0, -1)
+    with open(path, "w") as f:
+        for entry in reversed(entries):
+            f.write(entry.decode() + "\n")
+
+    if clear:
+        cache.delete_key(TRAFFIC_QUEUE)
+    return len(entries)
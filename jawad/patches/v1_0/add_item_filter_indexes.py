@@ -0,0 +1,27 @@
+import frappe
+
+# doctype -> {index name: columns}
+ITEM_FILTER_INDEXES = {
+	"channelCatSubCat": {
+		# leading with each filter key lets the item semi-join seek on any of them
+		"channel_category_subcategory": ["channelid", "categoryid", "subcategoryid", "parent"],
+		"category_subcategory": ["categoryid", "subcategoryid", "parent"],
+		"subcategory": ["subcategoryid", "parent"],
+	},
+	"Item": {
+		"custom_brand_id": ["custom_brand_id"],
+		"custom_company": ["custom_company"],
+	},
+}
+
+
+def execute():
+	"""Index the columns ``get_item_list`` filters on."""
+	for doctype, indexes in ITEM_FILTER_INDEXES.items():
+		if not frappe.db.table_exists(doctype):
+			continue
+
+		for index_name, columns in indexes.items():
+			# custom fields may not be installed on every site
+			if all(frappe.db.has_column(doctype, column) for column in columns):
+				frappe.db.add_index(doctype, columns, index_name=index_name)
@@ -0,0 +1,19 @@
+import frappe
+
+from jawad.jawad.sync import SYNC_DOCTYPES
+
+
+def execute():
+	"""Make sure every synced table can seek on ``modified`` for delta sync."""
+	for doctype in SYNC_DOCTYPES:
+		if not frappe.db.table_exists(doctype):
+			continue
+
+		# InnoDB appends the primary key to secondary indexes, so an index
+		# on ``modified`` already serves ``(modified, name)`` keyset reads
+		has_index = frappe.db.sql(
+			f"""SHOW INDEX FROM `tab{doctype}`
+			WHERE Column_name = 'modified' AND Seq_in_index = 1"""
+		)
+		if not has_index:
+			frappe.db.add_index(doctype, ["modified"], index_name="modified")
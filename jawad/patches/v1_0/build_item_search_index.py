@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+	"""Fill the item search index for the items that existed before it."""
+	# a full catalog takes longer than a migration should wait
+	frappe.enqueue(
+		"jawad.jawad.search.rebuild_search_index",
+		queue="long",
+		timeout=3600,
+		enqueue_after_commit=True,
+	)